@@ -0,0 +1,39 @@
+# Benchmarks of the location utilities (future/util.py) and the city/buoy matching of the
+# scraper on a reduced dataset.
+from nautical.units import DistanceUnits
+
+
+def bench_get_buoys_near_coordinates(benchmark):
+    '''Distance search of every buoy around Los Angeles'''
+    from util import get_buoys_near_coordinates  # pylint: disable=import-outside-toplevel
+
+    result = benchmark(get_buoys_near_coordinates, 34.0522, -118.2437)
+    assert result
+
+
+def bench_get_buoys_near_location(benchmark):
+    '''Lookup of the buoys near Los Angeles from the data files'''
+    from util import get_buoys_near_location  # pylint: disable=import-outside-toplevel
+
+    result = benchmark(get_buoys_near_location, "los angeles", "california")
+    assert "46025" in result
+
+
+def bench_match_cities_to_buoys(benchmark, reduced_cities):
+    '''City/buoy matching of the scraper (create_city_buoy_lookup) on the reduced dataset'''
+    from scraper import match_cities_to_buoys, read_buoy_locations  # pylint: disable=import-outside-toplevel
+
+    buoys = read_buoy_locations()
+    result = benchmark.pedantic(
+        match_cities_to_buoys, args=(reduced_cities, buoys, 50.0, DistanceUnits.MILES), rounds=3
+    )
+    assert len(result) == len(reduced_cities)
+
+
+def bench_match_cities_to_buoys_grid(benchmark, reduced_cities):
+    '''Grid engine of the city/buoy matching on the reduced dataset'''
+    from scraper import match_cities_to_buoys_grid, read_buoy_locations  # pylint: disable=import-outside-toplevel
+
+    buoys = read_buoy_locations()
+    result = benchmark(match_cities_to_buoys_grid, reduced_cities, buoys, 50.0, DistanceUnits.MILES)
+    assert len(result) == len(reduced_cities)
@@ -0,0 +1,201 @@
+# Benchmarks of the hot paths of the lambda function: importing the location data, the
+# radius query of the buoys near a city, the fuzzy city name match, the spoken buoy ID
+# check, the ZIP code lookup, the variable lookup, reading a buoy (realtime2 parse and
+# create_buoy_wrapper) and the aggregation of the buoys near a location.
+import importlib
+from os.path import join
+import sys
+import pytest
+from fixtures import RealtimeFixtureDir
+
+# Buoys near Los Angeles (DataNearLocation)
+LosAngelesBuoys = ["46221", "46222", "46253", "46256", "46268", "46025"]
+
+# Phrases spoken for the BUOY_VAR slot, including phrases that are not found
+SpokenVariables = ["wave height", "water temperature", "wind speed", "dew point", "swell period", "tide", "foo",
+                   "waves", "gusts", "water tempature"]
+
+
+def bench_import_locations(benchmark):
+    '''Import of the location module, load of the US gazetteer and the buoy index and the
+    first radius query (the module is removed between rounds)'''
+    def setup():
+        sys.modules.pop("locations", None)
+
+    def load():
+        module = importlib.import_module("locations")
+        return module.find_buoys("california", "los angeles")
+
+    result = benchmark.pedantic(load, setup=setup, rounds=5)
+    assert "46025" in result
+
+
+@pytest.mark.parametrize("radius", [50.0, 250.0])
+def bench_find_buoys(benchmark, radius):
+    '''Radius query of the buoys near a city (BuoysNearLocation)'''
+    from locations import find_buoys  # pylint: disable=import-outside-toplevel
+
+    result = benchmark(find_buoys, "california", "los angeles", radius)
+    assert "46025" in result
+
+
+def bench_resolve_location(benchmark):
+    '''Fuzzy match of misheard city and state names (trigram index)'''
+    from locations import resolve_location  # pylint: disable=import-outside-toplevel
+
+    spoken = [("californa", "los angelas"), ("florida", "saint augustine"), ("virginia", "virginia beech")]
+    result = benchmark(lambda: [resolve_location(*x) for x in spoken])
+    assert result[0] == ("california", "los angeles")
+
+
+def bench_resolve_station(benchmark):
+    '''Normalization and trie check of spoken buoy IDs, including an unknown ID'''
+    from locations import resolve_station  # pylint: disable=import-outside-toplevel
+
+    spoken = ["four four zero two five", "44 025", "forty six oh twenty five", "four four zero two six"]
+    result = benchmark(lambda: [resolve_station(x) for x in spoken])
+    assert result[0] == ("44025", []) and result[3][0] is None
+
+
+@pytest.fixture(scope="module")
+def zip_table(tmp_path_factory):
+    '''ZIP code table of 33k synthetic ZIP codes (the size of the Census ZCTA list)'''
+    # pylint: disable=import-outside-toplevel
+    from synthetic_data import generate_zip_codes
+    from zipcodes import ZipCodeTable, write_zip_table
+
+    centroids = generate_zip_codes(33000)
+    filename = str(tmp_path_factory.mktemp("zips") / "zip_centroids.bin")
+    write_zip_table(centroids, filename)
+    return ZipCodeTable(filename), sorted(centroids)
+
+
+def bench_load_zip_table(benchmark, zip_table):
+    '''Load of the ZIP code table (first request of BuoysNearZipCode)'''
+    from zipcodes import ZipCodeTable  # pylint: disable=import-outside-toplevel
+
+    table, codes = zip_table
+    result = benchmark(lambda: len(ZipCodeTable(table.filename)))
+    assert result == len(codes)
+
+
+def bench_zip_lookup(benchmark, zip_table):
+    '''ZIP code centroid lookup and radius query (BuoysNearZipCode)'''
+    from locations import find_buoys_near  # pylint: disable=import-outside-toplevel
+
+    table, codes = zip_table
+    spoken = codes[::1000]
+
+    def lookup():
+        found = []
+        for code in spoken:
+            try:
+                found.append(find_buoys_near(*table.lookup(code), 250.0))
+            except KeyError:
+                pass
+        return found
+
+    result = benchmark(lookup)
+    assert result
+
+
+def bench_find_buoy_variable(benchmark):
+    '''Lookup of every spoken variable'''
+    from buoy_lookup import find_buoy_variable  # pylint: disable=import-outside-toplevel
+
+    result = benchmark(lambda: [find_buoy_variable(x) for x in SpokenVariables])
+    assert result[0] == "wvht"
+    assert result[-3:] == ["wvht", "gst", "wtmp"]
+
+
+def bench_parse_realtime(benchmark):
+    '''Parse of the newest observation of a realtime2 fixture'''
+    from buoy_lookup import TotalBuoyVariables  # pylint: disable=import-outside-toplevel
+    from realtime import parse_realtime_lines  # pylint: disable=import-outside-toplevel
+
+    with open(join(RealtimeFixtureDir, "46025.txt"), "r") as fixture:
+        lines = fixture.read().splitlines()
+
+    result = benchmark(parse_realtime_lines, lines, TotalBuoyVariables)
+    assert "wtmp" in result
+
+
+@pytest.mark.parametrize("station", ["46025", "44025"])
+def bench_create_buoy_wrapper(benchmark, ndbc_server, station):  # pylint: disable=unused-argument
+    '''Read of a single buoy from the stand-in, the station cache is bypassed'''
+    import lambda_function  # pylint: disable=import-outside-toplevel
+
+    lambda_function.station_cache.max_age = -1.0
+    try:
+        result = benchmark(lambda_function.create_buoy_wrapper, station)
+    finally:
+        lambda_function.station_cache.max_age = 300.0
+    assert result
+
+
+def bench_specific_data_multiple_variables(benchmark, ndbc_server, monkeypatch):  # pylint: disable=unused-argument
+    '''SpecificDataAtBuoy with several variables, the buoy is retrieved once per request'''
+    import lambda_function  # pylint: disable=import-outside-toplevel
+    from envelopes import create_envelope  # pylint: disable=import-outside-toplevel
+
+    calls = []
+    wrapper = lambda_function.create_buoy_wrapper
+    monkeypatch.setattr(lambda_function, "create_buoy_wrapper", lambda *args: calls.append(args) or wrapper(*args))
+    envelope = create_envelope("IntentRequest", "SpecificDataAtBuoy", {
+        "buoy_var": ["wind speed", "gusts", "water temperature"], "buoy_id": "46025"
+    })
+
+    requests = []
+
+    def handle():
+        requests.append(envelope)
+        return lambda_function.lambda_handler(envelope, None)
+
+    result = benchmark(handle)
+    speech = result["response"]["outputSpeech"]["ssml"]
+    assert "wind speed is" in speech and "gust is" in speech and "water temperature is" in speech
+    assert len(calls) == len(requests)
+
+
+def bench_session_follow_up(benchmark, ndbc_server, monkeypatch):  # pylint: disable=unused-argument
+    '''Follow-up question after a buoy report, answered from the session attributes'''
+    import lambda_function  # pylint: disable=import-outside-toplevel
+    from envelopes import create_envelope  # pylint: disable=import-outside-toplevel
+
+    report = lambda_function.lambda_handler(create_envelope("IntentRequest", "Buoy", {"buoy_id": "46025"}), None)
+    assert report["response"]["shouldEndSession"] is False
+
+    calls = []
+    wrapper = lambda_function.create_buoy_wrapper
+    monkeypatch.setattr(lambda_function, "create_buoy_wrapper", lambda *args: calls.append(args) or wrapper(*args))
+    envelope = create_envelope("IntentRequest", "SpecificDataAtBuoy", {"buoy_var": "wind speed"},
+                               attributes=report["sessionAttributes"], new=False)
+
+    result = benchmark(lambda_function.lambda_handler, envelope, None)
+    assert "wind speed is" in result["response"]["outputSpeech"]["ssml"]
+    assert not calls
+
+
+@pytest.fixture(scope="module")
+def los_angeles_data(ndbc_server):  # pylint: disable=unused-argument
+    '''Data retrieved for the buoys near Los Angeles'''
+    import lambda_function  # pylint: disable=import-outside-toplevel
+
+    return [lambda_function.create_buoy_wrapper(x) for x in LosAngelesBuoys]
+
+
+def bench_data_near_location_aggregation(benchmark, los_angeles_data):
+    '''Aggregation and speech rendering of DataNearLocationIntentHandler'''
+    # pylint: disable=import-outside-toplevel
+    from buoy_lookup import BaseVariables
+    from observations import reduce_observations, to_observation_array
+
+    def aggregate():
+        averages = reduce_observations(to_observation_array(los_angeles_data), BaseVariables)
+        return ", ".join(
+            [f"the average {BaseVariables[key][0]} is {round(value[0], 2)} {BaseVariables[key][1]}"
+             for key, value in averages.items()]
+        )
+
+    result = benchmark(aggregate)
+    assert "wave height" in result
@@ -0,0 +1,216 @@
+#!/bin/python
+# Measure the cold start (import) cost of the lambda function. Each run imports the
+# lambda function in a fresh interpreter with `-X importtime`, the import duration, peak
+# RSS and the import time of each module are reported (median over all runs).
+import argparse
+from collections import defaultdict
+from json import dumps, loads
+from os import getcwd
+from os.path import join, realpath, dirname
+from statistics import median
+from subprocess import run as run_process
+import sys
+from time import perf_counter
+
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+LambdaDir = join(__location__, "../lambda")
+
+# Modules that are always reported, even when they are not in the top modules
+TrackedModules = ["locations", "ask_sdk_core", "ask_sdk_model", "nautical", "boto3", "numpy"]
+
+# Modules that must not be imported to handle requests that do not use them
+LazyModules = ["locations", "nautical"]
+
+ChildScript = '''
+import json, resource, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_s": elapsed, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+'''
+
+
+LazyCheckScript = '''
+import json, sys
+sys.path.insert(0, {benchmarks!r})
+from envelopes import create_envelope
+import lambda_function
+lambda_function.lambda_handler(create_envelope({request_type!r}), None)
+print(json.dumps(sorted(x for x in {modules!r} if x in sys.modules)))
+'''
+
+
+def parse_importtime(stderr):
+    '''Parse the output of `-X importtime`.
+
+    :param stderr: stderr of the interpreter
+    :return: dictionary of module name -> (self us, cumulative us, name of the module that
+    imported it or None) for every module
+    '''
+    modules = {}
+    pending = []  # (name, depth) of the modules whose importer has not been found yet
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = len(name) - len(name.lstrip())
+        name = name.strip()
+        # the modules imported by this module are listed before it, indented further
+        while pending and pending[-1][1] > depth:
+            child, _ = pending.pop()
+            modules[child] = (modules[child][0], modules[child][1], name)
+        modules[name] = (int(self_us), int(cumulative_us), None)
+        pending.append((name, depth))
+    return modules
+
+
+def package_time(modules, package):
+    '''Import time of a package, its modules are imported from several places so the
+    cumulative time is the sum over the modules of the package that were not imported by
+    another module of the package.
+
+    :param modules: parsed import times of a run (see parse_importtime)
+    :param package: name of the package
+    :return: tuple of the number of modules, self us and cumulative us, None when the
+    package was not imported
+    '''
+    def _in_package(name):
+        return name == package or name.startswith(f"{package}.")
+
+    def _nested(name):
+        parent = modules[name][2]
+        while parent is not None:
+            if _in_package(parent):
+                return True
+            parent = modules[parent][2]
+        return False
+
+    names = [x for x in modules if _in_package(x)]
+    if not names:
+        return None
+    return (
+        len(names),
+        sum(modules[x][0] for x in names),
+        sum(modules[x][1] for x in names if not _nested(x)),
+    )
+
+
+def cold_start(module="lambda_function", env=None):
+    '''Import the module in a fresh interpreter.
+
+    :param module: name of the module to import from the lambda directory
+    :param env: environment variables for the interpreter
+    :return: dictionary with the wall time of the process, import time, peak RSS and
+    the per module import times
+    '''
+    start = perf_counter()
+    process = run_process(
+        [sys.executable, "-X", "importtime", "-c", ChildScript.format(module=module)],
+        cwd=LambdaDir, capture_output=True, text=True, env=env, check=True
+    )
+    wall = perf_counter() - start
+
+    result = loads(process.stdout.strip().splitlines()[-1])
+    result["wall_s"] = wall
+    result["modules"] = parse_importtime(process.stderr)
+    return result
+
+
+def benchmark(runs, module="lambda_function", top=15, env=None):
+    '''Run the cold start `runs` times and summarize the results.
+
+    :param runs: number of fresh interpreters
+    :param module: name of the module to import from the lambda directory
+    :param top: number of modules (by cumulative time) to report
+    :param env: environment variables for the interpreter
+    :return: dictionary of the summarized results
+    '''
+    results = [cold_start(module, env) for _ in range(runs)]
+
+    cumulative = defaultdict(list)
+    self_time = defaultdict(list)
+    packages = defaultdict(list)
+    for result in results:
+        for name, (self_us, cumulative_us, _) in result["modules"].items():
+            cumulative[name].append(cumulative_us)
+            self_time[name].append(self_us)
+        for name in TrackedModules:
+            times = package_time(result["modules"], name)
+            if times is not None:
+                packages[name].append(times)
+
+    def _summary(name):
+        return {
+            "self_ms": round(median(self_time[name]) / 1000, 3),
+            "cumulative_ms": round(median(cumulative[name]) / 1000, 3),
+        }
+
+    def _package_summary(package):
+        # None when the package was not imported (LazyModules are only imported by the
+        # handlers that use them, measure them with `-m <module>`)
+        if not packages[package]:
+            return None
+        return {
+            "modules": max(x[0] for x in packages[package]),
+            "self_ms": round(median(x[1] for x in packages[package]) / 1000, 3),
+            "cumulative_ms": round(median(x[2] for x in packages[package]) / 1000, 3),
+        }
+
+    top_modules = sorted(cumulative, key=lambda x: median(cumulative[x]), reverse=True)
+    top_modules = [x for x in top_modules if x != module][:top]
+
+    return {
+        "module": module,
+        "runs": runs,
+        "python": sys.version.split()[0],
+        "wall_ms": round(median(x["wall_s"] for x in results) * 1000, 3),
+        "import_ms": round(median(x["import_s"] for x in results) * 1000, 3),
+        "max_rss_kb": max(x["max_rss_kb"] for x in results),
+        "tracked": {name: _package_summary(name) for name in TrackedModules},
+        "top": {name: _summary(name) for name in top_modules},
+    }
+
+
+def check_lazy(request_type="LaunchRequest", modules=None):
+    '''Handle a request in a fresh interpreter and find the modules that were imported.
+
+    :param request_type: type of the request (LaunchRequest, SessionEndedRequest)
+    :param modules: list of modules that should not be imported (default LazyModules)
+    :return: list of the modules that were imported
+    '''
+    modules = modules or LazyModules
+    process = run_process(
+        [sys.executable, "-c", LazyCheckScript.format(
+            benchmarks=__location__, request_type=request_type, modules=modules
+        )],
+        cwd=LambdaDir, capture_output=True, text=True, check=True
+    )
+    return loads(process.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='cold_start',
+        description='measure the cold import of the lambda function',
+    )
+    parser.add_argument('-n', '--runs', type=int, default=10, help='number of fresh interpreters')
+    parser.add_argument('-m', '--module', type=str, default='lambda_function')
+    parser.add_argument('-t', '--top', type=int, default=15, help='number of modules to report')
+    parser.add_argument('-o', '--output', type=str, help='json file where the results are written')
+    parser.add_argument('--check-lazy', action='store_true',
+                        help='fail when a LaunchRequest imports any of the lazily loaded modules')
+    args = parser.parse_args()
+
+    if args.check_lazy:
+        for request_type in ("LaunchRequest", "SessionEndedRequest"):
+            imported = check_lazy(request_type)
+            if imported:
+                sys.exit(f"{request_type} imported {', '.join(imported)}")
+        print(f"LaunchRequest and SessionEndedRequest did not import {', '.join(LazyModules)}")
+        sys.exit(0)
+
+    output = benchmark(args.runs, args.module, args.top)
+    if args.output:
+        with open(args.output, "w+") as jsonfile:
+            jsonfile.write(dumps(output, indent=2))
+    print(dumps(output, indent=2))
@@ -0,0 +1,110 @@
+#!/bin/python
+# Compare the results of the benchmark suite (pytest-benchmark) against the committed
+# baseline. Benchmarks whose median is slower than the baseline by more than the threshold
+# (percent) are flagged as regressions and the exit code is 1. When no results file is
+# provided the suite is run first.
+import argparse
+from json import dumps, loads
+from os import getcwd, remove
+from os.path import join, realpath, dirname
+from subprocess import run as run_process
+import sys
+from tempfile import NamedTemporaryFile
+
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+
+BaselineFile = join(__location__, "baseline.json")
+
+
+def run_suite(output):
+    '''Run the benchmark suite and write the pytest-benchmark json to `output`'''
+    run_process(
+        [sys.executable, "-m", "pytest", "-q", f"--benchmark-json={output}"],
+        cwd=__location__, check=True
+    )
+
+
+def read_results(filename):
+    '''Read a pytest-benchmark json file.
+
+    :param filename: path to the file written with --benchmark-json
+    :return: dictionary of benchmark name -> dictionary of the stats (seconds)
+    '''
+    with open(filename, "r") as jsonfile:
+        data = loads(jsonfile.read())
+    return {
+        bench["name"]: {key: bench["stats"][key] for key in ("min", "median", "mean", "stddev", "rounds")}
+        for bench in data["benchmarks"]
+    }
+
+
+def compare(results, baseline, threshold):
+    '''Compare the medians of the results to the baseline.
+
+    :param results: dictionary of benchmark name -> stats
+    :param baseline: dictionary of benchmark name -> stats
+    :param threshold: percent slower than the baseline that is a regression
+    :return: list of dictionaries (name, baseline, current, change and status)
+    '''
+    rows = []
+    for name in sorted(set(results) | set(baseline)):
+        current = results.get(name, {}).get("median")
+        base = baseline.get(name, {}).get("median")
+        change = None
+        if current is None:
+            status = "missing"
+        elif base is None:
+            status = "new"
+        else:
+            change = (current - base) / base * 100.0
+            status = "regression" if change > threshold else "ok"
+        rows.append({"name": name, "baseline": base, "current": current, "change": change, "status": status})
+    return rows
+
+
+def _format_ms(value):
+    return "" if value is None else f"{value * 1000:.3f}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='compare',
+        description='compare the benchmark suite against the committed baseline',
+    )
+    parser.add_argument('results', type=str, nargs='?', default=None,
+                        help='pytest-benchmark json file, the suite is run when not provided')
+    parser.add_argument('-b', '--baseline', type=str, default=BaselineFile)
+    parser.add_argument('-t', '--threshold', type=float, default=20.0, help='percent slower that is a regression')
+    parser.add_argument('--update', action='store_true', help='replace the baseline with the results')
+    args = parser.parse_args()
+
+    results_file = args.results
+    if results_file is None:
+        with NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            results_file = tmp.name
+        run_suite(results_file)
+        current_results = read_results(results_file)
+        remove(results_file)
+    else:
+        current_results = read_results(results_file)
+
+    if args.update:
+        with open(args.baseline, "w") as jsonfile:
+            jsonfile.write(dumps(current_results, indent=2, sort_keys=True) + "\n")
+        print(f"Updated {args.baseline} with {len(current_results)} benchmarks")
+        sys.exit(0)
+
+    with open(args.baseline, "r") as jsonfile:
+        baseline_results = loads(jsonfile.read())
+
+    output = compare(current_results, baseline_results, args.threshold)
+    print(f"{'benchmark':<42} {'baseline ms':>12} {'current ms':>12} {'change':>8}  status")
+    for row in output:
+        change = "" if row["change"] is None else f"{row['change']:+.1f}%"
+        print(f"{row['name']:<42} {_format_ms(row['baseline']):>12} {_format_ms(row['current']):>12} "
+              f"{change:>8}  {row['status']}")
+
+    regressions = [row["name"] for row in output if row["status"] == "regression"]
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,53 @@
+# Configuration of the benchmark suite (pytest-benchmark). The lambda function, data
+# scripts and future utilities are importable, and NDBC is replaced by the local stand-in
+# for the whole session.
+from json import loads
+from os import environ, getcwd
+from os.path import join, realpath, dirname
+import sys
+import pytest
+
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+for directory in ("../lambda", "../data", "../future"):
+    sys.path.insert(0, join(__location__, directory))
+
+# pylint: disable=wrong-import-position
+from fixtures import LatestObservationsFixture
+from ndbc_stub import NdbcStubServer
+
+# Number of cities matched by the reduced scraper benchmark
+ReducedCities = 25
+
+_server = None
+
+
+def pytest_configure(config):  # pylint: disable=unused-argument
+    '''Start the NDBC stand-in before the lambda modules read their configuration'''
+    global _server
+    _server = NdbcStubServer().start()
+    environ["NDBC_REALTIME_URL"] = f"{_server.url}/data/realtime2"
+    environ["LATEST_OBS_FILE"] = LatestObservationsFixture
+    environ["METRICS_ENABLED"] = "false"
+
+
+def pytest_unconfigure(config):  # pylint: disable=unused-argument
+    if _server is not None:
+        _server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def ndbc_server():
+    '''Running NDBC stand-in'''
+    return _server
+
+
+@pytest.fixture(scope="session")
+def reduced_cities():
+    '''Reduced city dataset (the first cities of cities_with_buoys.json) in the
+    format of scraper.read_cities'''
+    with open(join(__location__, "../data/cities_with_buoys.json"), "r") as jsonfile:
+        data = loads(jsonfile.read())
+    return {
+        city_id: {key: value for key, value in city.items() if key != "buoys"}
+        for city_id, city in list(data.items())[:ReducedCities]
+    }
@@ -0,0 +1,77 @@
+#!/bin/python
+# Create the request envelopes that Alexa sends to the lambda function.
+from uuid import uuid4
+
+ApplicationId = "amzn1.ask.skill.benchmark"
+UserId = "amzn1.ask.account.benchmark"
+
+
+def create_resolutions(slot_id):
+    '''Entity resolution of a slot value that matched the value with the ID'''
+    return {
+        "resolutionsPerAuthority": [{
+            "authority": f"amzn1.er-authority.echo-sdk.{ApplicationId}.SLOT",
+            "status": {"code": "ER_SUCCESS_MATCH"},
+            "values": [{"value": {"name": slot_id, "id": slot_id}}],
+        }]
+    }
+
+
+def create_slot(name, value):
+    '''Slot of an intent, a list of values is sent as the values of a slot that accepts
+    multiple values'''
+    if isinstance(value, (list, tuple)):
+        return {
+            "name": name,
+            "confirmationStatus": "NONE",
+            "slotValue": {"type": "List", "values": [{"type": "Simple", "value": x} for x in value]},
+        }
+    return {"name": name, "value": value, "confirmationStatus": "NONE"}
+
+
+def create_envelope(request_type="IntentRequest", intent=None, slots=None, attributes=None, new=True, slot_ids=None):
+    '''Create an Alexa request envelope.
+
+    :param request_type: type of the request (LaunchRequest, IntentRequest, SessionEndedRequest)
+    :param intent: name of the intent for IntentRequests
+    :param slots: dictionary of slot name -> spoken value (or list of spoken values)
+    :param slot_ids: dictionary of slot name -> ID of the resolved value (entity resolution)
+    :param attributes: session attributes
+    :param new: True when this is the first request of the session
+    :return: dictionary that can be passed to the lambda handler
+    '''
+    request = {
+        "type": request_type,
+        "requestId": f"amzn1.echo-api.request.{uuid4()}",
+        "timestamp": "2023-06-10T16:50:00Z",
+        "locale": "en-US",
+    }
+    if request_type == "IntentRequest":
+        request["intent"] = {
+            "name": intent,
+            "confirmationStatus": "NONE",
+            "slots": {name: create_slot(name, value) for name, value in (slots or {}).items()},
+        }
+        for name, slot_id in (slot_ids or {}).items():
+            request["intent"]["slots"][name]["resolutions"] = create_resolutions(slot_id)
+    elif request_type == "SessionEndedRequest":
+        request["reason"] = "USER_INITIATED"
+
+    return {
+        "version": "1.0",
+        "session": {
+            "new": new,
+            "sessionId": f"amzn1.echo-api.session.{uuid4()}",
+            "application": {"applicationId": ApplicationId},
+            "user": {"userId": UserId},
+            "attributes": attributes or {},
+        },
+        "context": {
+            "System": {
+                "application": {"applicationId": ApplicationId},
+                "user": {"userId": UserId},
+                "apiEndpoint": "https://api.amazonalexa.com",
+            }
+        },
+        "request": request,
+    }
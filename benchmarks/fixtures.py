@@ -0,0 +1,176 @@
+#!/bin/python
+# This script is used to create the NDBC fixtures used by the benchmarks. The fixtures
+# can be recorded from the NDBC website or synthesized in the same format when the
+# website is not available (the committed fixtures were synthesized).
+import argparse
+from datetime import datetime, timedelta, timezone
+from json import loads
+from os import getcwd, makedirs
+from os.path import join, realpath, dirname
+from random import Random
+import sys
+from urllib.request import urlopen
+
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+sys.path.insert(0, join(__location__, "../lambda"))
+
+FixtureDir = join(__location__, "fixtures")
+RealtimeFixtureDir = join(FixtureDir, "realtime2")
+StationPageFixtureDir = join(FixtureDir, "station_page")
+LatestObservationsFixture = join(FixtureDir, "latest_obs.txt")
+
+NdbcUrl = "https://www.ndbc.noaa.gov/data"
+StationPageUrl = "https://www.ndbc.noaa.gov/station_page.php"
+
+# Stations that are recorded by default, buoys near Los Angeles and New York
+DefaultStations = ["46221", "46025", "44025"]
+
+RealtimeHeader = (
+    "#YY  MM DD hh mm WDIR WSPD GST  WVHT   DPD   APD MWD   PRES  ATMP  WTMP  DEWP  VIS PTDY  TIDE\n"
+    "#yr  mo dy hr mn degT m/s  m/s     m   sec   sec degT   hPa  degC  degC  degC  nmi  hPa    ft\n"
+)
+
+LatestObservationsHeader = (
+    "#STN       LAT      LON  YYYY MM DD hh mm WDIR WSPD   GST WVHT  DPD APD MWD   PRES  PTDY  ATMP  WTMP  DEWP  VIS   TIDE\n"
+    "#text      deg      deg   yr mo day hr mn degT  m/s   m/s   m   sec sec degT   hPa   hPa  degC  degC  degC  nmi     ft\n"
+)
+
+
+def _value(rand, low, high, fmt, missing_rate=0.05):
+    '''Random value in the range, formatted, or the NDBC missing marker'''
+    if rand.random() < missing_rate:
+        return "MM"
+    return fmt.format(rand.uniform(low, high))
+
+
+def _observation(rand):
+    '''Create a random set of standard meteorological values'''
+    return {
+        "WDIR": _value(rand, 0, 359, "{:.0f}"),
+        "WSPD": _value(rand, 0.0, 15.0, "{:.1f}"),
+        "GST": _value(rand, 0.0, 20.0, "{:.1f}"),
+        "WVHT": _value(rand, 0.2, 4.0, "{:.1f}", 0.2),
+        "DPD": _value(rand, 3, 18, "{:.0f}", 0.2),
+        "APD": _value(rand, 3.0, 12.0, "{:.1f}", 0.2),
+        "MWD": _value(rand, 0, 359, "{:.0f}", 0.2),
+        "PRES": _value(rand, 995.0, 1030.0, "{:.1f}"),
+        "ATMP": _value(rand, 5.0, 30.0, "{:.1f}"),
+        "WTMP": _value(rand, 5.0, 28.0, "{:.1f}"),
+        "DEWP": _value(rand, 0.0, 25.0, "{:.1f}"),
+        "VIS": "MM",
+        "PTDY": _value(rand, -3.0, 3.0, "{:+.1f}", 0.5),
+        "TIDE": "MM",
+    }
+
+
+def synthesize_realtime(station, days=45, minutes=60, now=None):
+    '''Create the contents of a realtime2 standard meteorological file, newest row first.
+
+    :param station: station ID, used to seed the values
+    :param days: number of days of observations
+    :param minutes: number of minutes between observations
+    :param now: time of the newest observation
+    :return: contents of the file
+    '''
+    rand = Random(station)
+    now = now or datetime(2023, 6, 10, 16, 50, tzinfo=timezone.utc)
+    rows = [RealtimeHeader]
+    for i in range(int(days * 24 * 60 / minutes)):
+        t = now - timedelta(minutes=i * minutes)
+        v = _observation(rand)
+        rows.append(
+            f"{t.year:4d} {t.month:02d} {t.day:02d} {t.hour:02d} {t.minute:02d} {v['WDIR']:>3} "
+            f"{v['WSPD']:>4} {v['GST']:>4} {v['WVHT']:>5} {v['DPD']:>5} {v['APD']:>5} {v['MWD']:>3} "
+            f"{v['PRES']:>6} {v['ATMP']:>5} {v['WTMP']:>5} {v['DEWP']:>5} {v['VIS']:>4} "
+            f"{v['PTDY']:>4} {v['TIDE']:>5}\n"
+        )
+    return "".join(rows)
+
+
+def synthesize_latest_observations(buoy_locations, now=None):
+    '''Create the contents of the latest observation file for every buoy.
+
+    :param buoy_locations: dictionary of station ID to location (buoy_locations.json)
+    :param now: time of the observations
+    :return: contents of the file
+    '''
+    now = now or datetime(2023, 6, 10, 16, 50, tzinfo=timezone.utc)
+    rows = [LatestObservationsHeader]
+    for station, location in buoy_locations.items():
+        rand = Random(station)
+        v = _observation(rand)
+        rows.append(
+            f"{station:<7} {location['latitude']:>7.3f} {location['longitude']:>8.3f} "
+            f"{now.year:4d} {now.month:02d} {now.day:02d} {now.hour:02d} {now.minute:02d} "
+            f"{v['WDIR']:>4} {v['WSPD']:>5} {v['GST']:>5} {v['WVHT']:>4} {v['DPD']:>4} {v['APD']:>3} "
+            f"{v['MWD']:>3} {v['PRES']:>6} {v['PTDY']:>5} {v['ATMP']:>5} {v['WTMP']:>5} {v['DEWP']:>5} "
+            f"{v['VIS']:>4} {v['TIDE']:>6}\n"
+        )
+    return "".join(rows)
+
+
+# Units of the values on the station page (the units of nautical)
+StationPageUnits = {
+    "wspd": "kts", "gst": "kts", "wvht": "ft", "dpd": "sec", "apd": "sec", "pres": "in",
+    "atmp": "&#176;F", "wtmp": "&#176;F", "dewp": "&#176;F", "vis": "nmi", "tide": "ft",
+}
+
+
+def synthesize_station_page(station, realtime):
+    '''Create the station page (station_page.php) of a station from its realtime2 file. The
+    page only has the "Conditions at <station>" table that nautical (create_buoy) parses, with
+    the newest values of the file in the units of the station page (the recorded pages are
+    much larger).
+
+    :param station: station ID
+    :param realtime: contents of the realtime2 file of the station
+    :return: contents of the page (html)
+    '''
+    from buoy_lookup import TotalBuoyVariables  # pylint: disable=import-outside-toplevel
+    from realtime import parse_realtime_lines  # pylint: disable=import-outside-toplevel
+
+    values = parse_realtime_lines(realtime.splitlines(), TotalBuoyVariables)
+    rows = "".join(
+        f"<tr><td>{TotalBuoyVariables[key][0].title()} ({key.upper()}):</td>"
+        f"<td> {value} {StationPageUnits.get(key, '')}</td></tr>\n"
+        for key, value in values.items()
+    )
+    return (
+        f"<html><body><table>\n<caption>Conditions at {station} as of 4:50 pm GMT on 06/10/2023</caption>\n"
+        f"<tr><td colspan=\"2\"></td></tr>\n{rows}</table></body></html>\n"
+    )
+
+
+def record(url, path):
+    '''Save the contents of the url to the path'''
+    with urlopen(url) as response:
+        data = response.read()
+    with open(path, "wb") as fixture:
+        fixture.write(data)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='fixtures',
+        description='record or synthesize NDBC fixtures for the benchmarks',
+    )
+    parser.add_argument('-f', '--function', type=str, choices=['record', 'synthesize'], default='synthesize')
+    parser.add_argument('-s', '--stations', type=str, nargs='+', default=DefaultStations, help='realtime2 stations')
+    args = parser.parse_args()
+
+    makedirs(RealtimeFixtureDir, exist_ok=True)
+    makedirs(StationPageFixtureDir, exist_ok=True)
+
+    if args.function == 'record':
+        record(f"{NdbcUrl}/latest_obs/latest_obs.txt", LatestObservationsFixture)
+        for station in args.stations:
+            record(f"{NdbcUrl}/realtime2/{station}.txt", join(RealtimeFixtureDir, f"{station}.txt"))
+            record(f"{StationPageUrl}?station={station}", join(StationPageFixtureDir, f"{station}.html"))
+    else:
+        with open(join(__location__, "../data/buoy_locations.json"), "r") as jsonfile:
+            buoy_data = loads(jsonfile.read())
+        with open(LatestObservationsFixture, "w+") as fixture:
+            fixture.write(synthesize_latest_observations(buoy_data))
+        for station in args.stations:
+            with open(join(RealtimeFixtureDir, f"{station}.txt"), "w+") as fixture:
+                fixture.write(synthesize_realtime(station))
@@ -0,0 +1,87 @@
+#!/bin/python
+# Compare the init strategies (INIT_STRATEGY) of the lambda function. Each run starts a
+# fresh interpreter, imports the lambda function (init duration) and handles a first and
+# second request. NDBC is replaced by the local stand-in.
+import argparse
+from json import dumps, loads
+from os import environ, getcwd
+from os.path import join, realpath, dirname
+from statistics import median
+from subprocess import run as run_process
+import sys
+from ndbc_stub import NdbcStubServer
+
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+LambdaDir = join(__location__, "../lambda")
+
+Strategies = ["eager", "lazy", "background"]
+
+ChildScript = '''
+import json, sys, time
+sys.path.insert(0, {benchmarks!r})
+from envelopes import create_envelope
+start = time.perf_counter()
+import lambda_function
+init = time.perf_counter() - start
+time.sleep({delay})
+latencies = []
+for _ in range(2):
+    envelope = create_envelope("IntentRequest", "DataNearLocation", {{"near_city": "los angeles", "near_state": "california"}})
+    start = time.perf_counter()
+    lambda_function.lambda_handler(envelope, None)
+    latencies.append(time.perf_counter() - start)
+print(json.dumps({{"init_s": init, "first_s": latencies[0], "second_s": latencies[1]}}))
+'''
+
+
+def run(strategies, runs, delay):
+    '''Run each strategy `runs` times.
+
+    :param strategies: list of init strategies
+    :param runs: number of fresh interpreters per strategy
+    :param delay: seconds between the end of init and the first request
+    :return: dictionary of strategy -> median init, first and second request time (ms)
+    '''
+    server = NdbcStubServer().start()
+    results = {}
+    for strategy in strategies:
+        env = dict(environ)
+        env.update({
+            "INIT_STRATEGY": strategy,
+            "NDBC_REALTIME_URL": f"{server.url}/data/realtime2",
+        })
+        samples = []
+        for _ in range(runs):
+            process = run_process(
+                [sys.executable, "-c", ChildScript.format(benchmarks=__location__, delay=delay)],
+                cwd=LambdaDir, capture_output=True, text=True, env=env, check=True
+            )
+            samples.append(loads(process.stdout.strip().splitlines()[-1]))
+
+        results[strategy] = {
+            key.replace("_s", "_ms"): round(median(x[key] for x in samples) * 1000, 3)
+            for key in ("init_s", "first_s", "second_s")
+        }
+    server.shutdown()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='init_strategy',
+        description='compare the init duration and first request latency of each init strategy',
+    )
+    parser.add_argument('-s', '--strategies', type=str, nargs='+', default=Strategies, choices=Strategies)
+    parser.add_argument('-n', '--runs', type=int, default=5, help='number of fresh interpreters per strategy')
+    parser.add_argument('-d', '--delay', type=float, default=0.0,
+                        help='seconds between the end of init and the first request')
+    parser.add_argument('--json', action='store_true', help='output the results as json')
+    args = parser.parse_args()
+
+    output = run(args.strategies, args.runs, args.delay)
+    if args.json:
+        print(dumps(output, indent=2))
+    else:
+        print(f"{'strategy':<12} {'init ms':>9} {'first ms':>9} {'second ms':>10}")
+        for strategy, result in output.items():
+            print(f"{strategy:<12} {result['init_ms']:>9} {result['first_ms']:>9} {result['second_ms']:>10}")
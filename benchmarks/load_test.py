@@ -0,0 +1,308 @@
+#!/bin/python
+# Offline replay load test of the lambda handler. Request envelopes are generated for every
+# intent in the interaction model using real cities, states and buoy IDs from the location
+# data, then replayed against lambda_handler by a pool of workers. NDBC is replaced by the
+# local stand-in (recorded fixtures) with an optional latency added to each response or
+# the latency and faults of a scenario (scenarios/).
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps, load
+from os import environ, getcwd
+from os.path import join, realpath, dirname
+from random import Random
+from resource import getrusage, RUSAGE_SELF
+import sys
+from time import perf_counter
+from envelopes import create_envelope
+from fixtures import LatestObservationsFixture
+from ndbc_stub import FaultScenario, NdbcStubServer
+
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+sys.path.insert(0, join(__location__, "../lambda"))
+
+InteractionModel = join(__location__, "../interactionModels/custom/en-US.json")
+
+# Slot types whose values have IDs (entity resolution, data/slot_data.py)
+ResolvedSlotTypes = ("AMAZON.City", "AMAZON.US_STATE", "BUOY_ID")
+
+
+def read_intents(model_path=InteractionModel):
+    '''Read the intents and the values of the custom slot types from the interaction model.
+
+    :param model_path: path to the interaction model
+    :return: tuple of the dictionary of intent name -> {slot name: slot type} and the
+    dictionary of slot type -> list of values
+    '''
+    with open(model_path, "r") as model_file:
+        language_model = load(model_file)["interactionModel"]["languageModel"]
+
+    intents = {
+        intent["name"]: {slot["name"]: slot["type"] for slot in intent.get("slots", [])}
+        for intent in language_model["intents"]
+    }
+    types = {
+        slot_type["name"]: [value["name"]["value"] for value in slot_type["values"]]
+        for slot_type in language_model.get("types", [])
+    }
+    return intents, types
+
+
+class RequestGenerator:
+    '''Generate request envelopes for the intents in the interaction model. Cities and
+    states are taken from the location data and buoy IDs are the buoys near those cities.
+    '''
+
+    def __init__(self, location_data, intents, types, seed=0):
+        '''
+        :param location_data: dictionary of state -> city -> {"buoys": [...]}
+        :param intents: dictionary of intent name -> {slot name: slot type}
+        :param types: dictionary of slot type -> list of values
+        :param seed: seed for the random choices
+        '''
+        self.random = Random(seed)
+        self.intents = intents
+        self.types = types
+        self.cities = [
+            (state, city) for state, cities in location_data.items()
+            for city, info in cities.items() if info.get("buoys")
+        ]
+        self.buoys = sorted({buoy for state, city in self.cities for buoy in location_data[state][city]["buoys"]})
+
+    def slot_values(self, slots):
+        '''Choose a value for each slot of an intent.
+
+        :param slots: dictionary of slot name -> slot type
+        :return: dictionary of slot name -> value
+        '''
+        state, city = self.random.choice(self.cities)
+        values = {}
+        for name, slot_type in slots.items():
+            if slot_type == "AMAZON.City":
+                values[name] = city
+            elif slot_type == "AMAZON.US_STATE":
+                values[name] = state
+            elif slot_type == "BUOY_ID":
+                values[name] = self.random.choice(self.buoys)
+            elif name == "zip_code":
+                values[name] = f"{self.random.randrange(1000, 100000):05d}"
+            elif self.types.get(slot_type):
+                values[name] = self.random.choice(self.types[slot_type])
+        return values
+
+    def generate(self, count):
+        '''Generate envelopes, the intents (and a LaunchRequest) are used in turn.
+
+        :param count: number of envelopes
+        :return: list of (name, envelope) tuples
+        '''
+        names = ["LaunchRequest"] + sorted(self.intents)
+        envelopes = []
+        for i in range(count):
+            name = names[i % len(names)]
+            if name == "LaunchRequest":
+                envelope = create_envelope("LaunchRequest")
+            else:
+                slots = self.intents[name]
+                values = self.slot_values(slots)
+                # the values are the keys of the location data and the station IDs, which
+                # are the IDs of the resolved slot values
+                slot_ids = {x: y for x, y in values.items() if slots[x] in ResolvedSlotTypes}
+                envelope = create_envelope("IntentRequest", name, values, slot_ids=slot_ids)
+            envelopes.append((name, envelope))
+        return envelopes
+
+
+def scenario_envelopes(requests, count):
+    '''Create the envelopes for the requests of a scenario, the requests are used in turn.
+
+    :param requests: list of {"intent": name, "slots": {slot name: value}}
+    :param count: number of envelopes
+    :return: list of (name, envelope) tuples
+    '''
+    return [
+        (request["intent"], create_envelope("IntentRequest", request["intent"], request.get("slots")))
+        for request in (requests[i % len(requests)] for i in range(count))
+    ]
+
+
+def percentile(values, fraction):
+    '''Nearest rank percentile of a list of values'''
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def summarize(latencies):
+    '''Summary (ms) of a list of latencies in seconds'''
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 3),
+    }
+
+
+def current_rss():
+    '''Resident set size of the process in MB'''
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            pages = int(statm.read().split()[1])
+        return round(pages * 4096 / (1024 * 1024), 1)
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def replay(envelopes, concurrency, server=None):
+    '''Replay the envelopes against lambda_handler.
+
+    :param envelopes: list of (name, envelope) tuples
+    :param concurrency: number of requests handled at the same time
+    :param server: running NdbcStubServer, the statistics of the stand-in are reported
+    :return: dictionary of the results
+    '''
+    import lambda_function  # pylint: disable=import-outside-toplevel
+
+    def handle(item):
+        name, envelope = item
+        start = perf_counter()
+        try:
+            response = lambda_function.lambda_handler(envelope, None)
+            # CatchAllExceptionHandler answers every failed request with the error speech
+            speech = response.get("response", {}).get("outputSpeech", {}).get("ssml", "")
+            failed = lambda_function.ErrorSpeech in speech
+        except Exception:  # pylint: disable=broad-except
+            failed = True
+        return name, perf_counter() - start, failed
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(handle, envelopes))
+    elapsed = perf_counter() - start
+
+    by_intent = {}
+    for name, latency, _ in results:
+        by_intent.setdefault(name, []).append(latency)
+
+    output = {
+        "requests": len(results),
+        "concurrency": concurrency,
+        "failures": sum(1 for _, _, failed in results if failed),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "latency": summarize([latency for _, latency, _ in results]),
+        "intents": {name: summarize(values) for name, values in sorted(by_intent.items())},
+        "rss_mb": current_rss(),
+        "peak_rss_mb": round(getrusage(RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if server is not None:
+        output["ndbc_requests"] = len(server.bytes_sent)
+        output["ndbc_bytes"] = sum(server.bytes_sent.values())
+    return output
+
+
+def served_variables(values):
+    '''Keep the spoken variables that the fixtures report. The other variables (ex. depth,
+    salinity or tide) are searched for on the station page, which nautical downloads from
+    the NDBC website.
+
+    :param values: list of the BUOY_VAR slot values
+    :return: list of the slot values that can be answered offline
+    '''
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    from buoy_lookup import find_buoy_variable
+    from observations import load_latest_observations
+
+    table = load_latest_observations(LatestObservationsFixture)
+    reported = {key for key in table.data.dtype.names if not np.isnan(table.data[key]).all()}
+    return [x for x in values if find_buoy_variable(x) is None or find_buoy_variable(x) in reported]
+
+
+def run(count, concurrency, latency, seed, latest_obs=False, cache=True, all_variables=False, scenario=None):
+    '''Start the NDBC stand-in, generate the envelopes and replay them.
+
+    :param count: number of requests
+    :param concurrency: number of requests handled at the same time
+    :param latency: seconds added to each NDBC response
+    :param seed: seed used to generate the requests
+    :param latest_obs: when True the latest observations fixture is used (USE_LATEST_OBS)
+    :param cache: when False the station cache is disabled so each request fetches
+    :param all_variables: when True every BUOY_VAR value is requested, including the
+    values that require the NDBC website
+    :param scenario: FaultScenario of the stand-in. The requests of the scenario (when
+    present) are replayed instead of the generated requests.
+    :return: dictionary of the results
+    '''
+    server = NdbcStubServer(latency=latency, scenario=scenario).start()
+    # the lambda reads its configuration on import
+    environ["NDBC_REALTIME_URL"] = f"{server.url}/data/realtime2"
+    environ["LATEST_OBS_FILE"] = LatestObservationsFixture
+    environ.setdefault("METRICS_ENABLED", "false")
+    if latest_obs:
+        environ["USE_LATEST_OBS"] = "true"
+    if not cache:
+        environ["STATION_CACHE_MAX_AGE"] = "0"
+
+    if scenario is not None and scenario.requests:
+        envelopes = scenario_envelopes(scenario.requests, count)
+    else:
+        from locations import Location_Breakdown  # pylint: disable=import-outside-toplevel
+
+        intents, types = read_intents()
+        if not all_variables:
+            types["BUOY_VAR"] = served_variables(types.get("BUOY_VAR", []))
+        envelopes = RequestGenerator(Location_Breakdown, intents, types, seed).generate(count)
+
+    output = replay(envelopes, concurrency, server)
+    server.shutdown()
+
+    if scenario is not None:
+        output["scenario"] = scenario.name
+        if scenario.max_p99_ms is not None:
+            output["max_p99_ms"] = scenario.max_p99_ms
+            output["passed"] = output["latency"]["p99_ms"] <= scenario.max_p99_ms and not output["failures"]
+    return output
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='load_test',
+        description='replay generated Alexa requests against the lambda handler',
+    )
+    parser.add_argument('-n', '--requests', type=int, default=500)
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('-l', '--latency', type=float, default=0.0, help='milliseconds added to each NDBC response')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latest-obs', action='store_true', help='use the latest observations fixture')
+    parser.add_argument('--no-cache', action='store_true', help='disable the station cache')
+    parser.add_argument('--all-variables', action='store_true',
+                        help='request variables that are not in the realtime2 files (requires network)')
+    parser.add_argument('--scenario', type=str, default=None, help='fault scenario (json) file')
+    parser.add_argument('--json', action='store_true', help='output the results as json')
+    args = parser.parse_args()
+
+    output = run(
+        args.requests, args.concurrency, args.latency / 1000.0, args.seed,
+        latest_obs=args.latest_obs, cache=not args.no_cache, all_variables=args.all_variables,
+        scenario=FaultScenario.from_file(args.scenario, args.seed) if args.scenario else None
+    )
+    if args.json:
+        print(dumps(output, indent=2))
+    else:
+        print(f"requests: {output['requests']}  concurrency: {output['concurrency']}  "
+              f"failures: {output['failures']}")
+        print(f"throughput: {output['throughput_rps']} req/s  rss: {output['rss_mb']} MB  "
+              f"peak rss: {output['peak_rss_mb']} MB")
+        print(f"{'intent':<28} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, result in [("all", output["latency"])] + list(output["intents"].items()):
+            print(f"{name:<28} {result['count']:>6} {result['p50_ms']:>9} "
+                  f"{result['p95_ms']:>9} {result['p99_ms']:>9}")
+        if "passed" in output:
+            print(f"scenario {output['scenario']}: p99 {output['latency']['p99_ms']} ms "
+                  f"(limit {output['max_p99_ms']} ms), {output['failures']} failures "
+                  f"{'passed' if output['passed'] else 'FAILED'}")
+
+    if not output.get("passed", True):
+        sys.exit(1)
@@ -0,0 +1,265 @@
+#!/bin/python
+# Local stand-in for the NDBC website. The server responds with the recorded fixtures
+# so that the skill and benchmarks can run without network access. Stations that do
+# not have a recorded fixture receive a synthesized realtime2 file. A fault scenario
+# (see scenarios/) adds per station latency, hangs, truncated files, missing (MM) data
+# and HTTP errors to the responses.
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import load
+from os.path import exists, join
+from random import Random
+from threading import Lock, Thread
+from time import sleep
+from fixtures import (
+    LatestObservationsFixture, RealtimeFixtureDir, StationPageFixtureDir, synthesize_realtime, synthesize_station_page
+)
+
+Faults = ("hang", "truncate", "missing", "status")
+
+
+def _missing_rows(body):
+    '''Replace every value of the data rows with MM, the date columns are kept'''
+    lines = []
+    for line in body.decode("utf-8").splitlines(keepends=True):
+        if not line.startswith("#"):
+            fields = line.split()
+            line = " ".join(fields[:5] + ["MM"] * (len(fields) - 5)) + "\n"
+        lines.append(line)
+    return "".join(lines).encode("utf-8")
+
+
+class FaultScenario:
+    '''Declarative description of the latency and faults of the stand-in. A scenario file
+    is json with the behavior of all stations (`default`) and of specific stations:
+
+        {
+            "default": {"latency": {"distribution": "normal", "mean_ms": 80, "stddev_ms": 20}},
+            "stations": {
+                "46221": {"fault": "hang", "hang_s": 30},
+                "46222": {"fault": "truncate", "bytes": 150},
+                "46253": {"fault": "missing"},
+                "46256": {"fault": "status", "status": 503, "probability": 0.5}
+            }
+        }
+
+    Latency distributions are `fixed` (ms), `uniform` (min_ms, max_ms), `normal` (mean_ms,
+    stddev_ms) and `exponential` (mean_ms). A fault is applied with `probability` (default 1).
+    Scenarios can also contain the `requests` replayed by the load test and the `max_p99_ms`
+    that the load test checks.
+    '''
+
+    def __init__(self, definition=None, seed=0):
+        '''
+        :param definition: dictionary in the format of a scenario file
+        :param seed: seed for the random latency and faults
+        '''
+        definition = definition or {}
+        self.name = definition.get("name", "default")
+        self.default = definition.get("default", {})
+        self.stations = {str(key).upper(): value for key, value in definition.get("stations", {}).items()}
+        self.requests = definition.get("requests", [])
+        self.max_p99_ms = definition.get("max_p99_ms")
+        self.random = Random(seed)
+        self._lock = Lock()
+
+        for behavior in [self.default] + list(self.stations.values()):
+            if behavior.get("fault") not in (None,) + Faults:
+                raise ValueError(f"Unknown fault {behavior['fault']}")
+
+    @classmethod
+    def from_file(cls, path, seed=0):
+        '''Load a scenario from a json file'''
+        with open(path, "r") as scenario_file:
+            definition = load(scenario_file)
+        definition.setdefault("name", path)
+        return cls(definition, seed)
+
+    def behavior(self, station):
+        '''Behavior of a station, the station values override the default values'''
+        return {**self.default, **self.stations.get(str(station).upper(), {})}
+
+    def latency(self, behavior):
+        '''Seconds to wait before responding'''
+        latency = behavior.get("latency")
+        if not latency:
+            return 0.0
+        if isinstance(latency, (int, float)):
+            return latency / 1000.0
+
+        distribution = latency.get("distribution", "fixed")
+        with self._lock:
+            if distribution == "uniform":
+                value = self.random.uniform(latency["min_ms"], latency["max_ms"])
+            elif distribution == "normal":
+                value = self.random.gauss(latency["mean_ms"], latency.get("stddev_ms", 0.0))
+            elif distribution == "exponential":
+                value = self.random.expovariate(1.0 / latency["mean_ms"])
+            else:
+                value = latency.get("value_ms", latency.get("mean_ms", 0.0))
+        return max(value, 0.0) / 1000.0
+
+    def fault(self, behavior):
+        '''Fault to apply to the response, None when the response is not altered'''
+        fault = behavior.get("fault")
+        if fault is None:
+            return None
+        with self._lock:
+            return fault if self.random.random() < behavior.get("probability", 1.0) else None
+
+
+class NdbcStubHandler(BaseHTTPRequestHandler):
+    '''Serve `/data/realtime2/<station>.txt`, `/data/latest_obs/latest_obs.txt` and
+    `/station_page.php?station=<station>`
+    '''
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        scenario = self.server.scenario
+        behavior = scenario.behavior(self.server.station(self.path))
+        delay = self.server.latency + scenario.latency(behavior)
+        if delay > 0:
+            sleep(delay)
+
+        fault = scenario.fault(behavior)
+        if fault == "hang":
+            # the client gives up (timeout) before the server responds
+            sleep(behavior.get("hang_s", 30.0))
+            return
+        if fault == "status":
+            self.send_error(behavior.get("status", 503))
+            return
+
+        body = self.server.lookup(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        if fault == "missing":
+            body = _missing_rows(body)
+
+        status = 200
+        start, end = 0, len(body) - 1
+        range_header = self.headers.get("Range")
+        if self.server.support_range and range_header and range_header.startswith("bytes="):
+            first, _, last = range_header[len("bytes="):].partition("-")
+            start = int(first or 0)
+            end = min(int(last), end) if last else end
+            status = 206
+
+        payload = body[start:end + 1]
+        size = len(payload)
+        if fault == "truncate":
+            # the headers announce the full payload, the connection is closed early
+            payload = payload[:behavior.get("bytes", 0)]
+            self.close_connection = True
+
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(size))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(body)}")
+        self.end_headers()
+
+        try:
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # clients stop reading as soon as they have the newest observation
+            pass
+        self.server.record(self.path, len(payload))
+
+
+class NdbcStubServer(ThreadingHTTPServer):
+    '''Threaded server that keeps the fixtures in memory and tracks the bytes sent'''
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), support_range=True, latency=0.0, scenario=None):
+        '''
+        :param address: (host, port) to listen on, port 0 selects a free port
+        :param support_range: when False the HTTP Range header is ignored
+        :param latency: seconds to wait before responding to each request
+        :param scenario: FaultScenario applied to the responses
+        '''
+        super().__init__(address, NdbcStubHandler)
+        self.support_range = support_range
+        self.latency = latency
+        self.scenario = scenario or FaultScenario()
+        self.bytes_sent = {}
+        self._fixtures = {}
+        self._lock = Lock()
+
+    @property
+    def url(self):
+        '''Base url of the server, the equivalent of https://www.ndbc.noaa.gov'''
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def lookup(self, path):
+        '''Find the contents (bytes) for the path, None when the path is not served'''
+        with self._lock:
+            if path not in self._fixtures:
+                self._fixtures[path] = self._load(path)
+            return self._fixtures[path]
+
+    @staticmethod
+    def station(path):
+        '''Station of a realtime2 or station page path, None for other paths'''
+        if path.startswith("/data/realtime2/") and path.endswith(".txt"):
+            return path[len("/data/realtime2/"):-len(".txt")]
+        if path.startswith("/station_page.php?station="):
+            return path[len("/station_page.php?station="):]
+        return None
+
+    def record(self, path, size):
+        '''Record the number of bytes sent for the path'''
+        with self._lock:
+            self.bytes_sent[path] = self.bytes_sent.get(path, 0) + size
+
+    @staticmethod
+    def _load(path):
+        if path == "/data/latest_obs/latest_obs.txt":
+            with open(LatestObservationsFixture, "rb") as fixture:
+                return fixture.read()
+
+        station = NdbcStubServer.station(path)
+        if station is not None:
+            page_path = join(StationPageFixtureDir, f"{station}.html")
+            if path.startswith("/station_page.php") and exists(page_path):
+                with open(page_path, "rb") as fixture:
+                    return fixture.read()
+            fixture_path = join(RealtimeFixtureDir, f"{station}.txt")
+            if exists(fixture_path):
+                with open(fixture_path, "rb") as fixture:
+                    realtime = fixture.read()
+            else:
+                realtime = synthesize_realtime(station).encode("utf-8")
+            if path.startswith("/station_page.php"):
+                return synthesize_station_page(station, realtime.decode("utf-8")).encode("utf-8")
+            return realtime
+
+        return None
+
+    def start(self):
+        '''Serve requests on a background thread'''
+        Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='ndbc_stub',
+        description='local NDBC stand-in that serves recorded fixtures',
+    )
+    parser.add_argument('-p', '--port', type=int, default=8080)
+    parser.add_argument('--no-range', action='store_true', help='ignore HTTP Range requests')
+    parser.add_argument('-l', '--latency', type=float, default=0.0, help='milliseconds added to each response')
+    parser.add_argument('--scenario', type=str, default=None, help='fault scenario (json) file')
+    args = parser.parse_args()
+
+    server = NdbcStubServer(
+        ("127.0.0.1", args.port), support_range=not args.no_range, latency=args.latency / 1000.0,
+        scenario=FaultScenario.from_file(args.scenario) if args.scenario else None
+    )
+    print(f"Serving NDBC fixtures at {server.url}")
+    server.serve_forever()
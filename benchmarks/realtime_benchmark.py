@@ -0,0 +1,108 @@
+#!/bin/python
+# Benchmark the partial (early terminating) read of NDBC realtime2 files against the full
+# parse of the station page by nautical (create_buoy), the path used when realtime2 cannot
+# be read. Both are served by the local NDBC stand-in using the recorded fixtures, the bytes
+# transferred and the time of each read are reported for each buoy.
+import argparse
+from json import dumps
+from os import environ, getcwd, listdir
+from os.path import join, realpath, dirname
+from statistics import median
+import sys
+from time import perf_counter
+from fixtures import RealtimeFixtureDir
+from ndbc_stub import NdbcStubServer
+
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+sys.path.insert(0, join(__location__, "../lambda"))
+
+
+def full_read(server, station, variable_dict):
+    '''Read and parse the station page of the station with nautical (create_buoy), the
+    behavior without the realtime2 read
+
+    :param server: running NdbcStubServer that serves the station page
+    :param station: station ID
+    :param variable_dict: dictionary where the keys control what variables are returned
+    :return: tuple of the dictionary of the variable to value and the bytes of the page
+    '''
+    # pylint: disable=import-outside-toplevel
+    import nautical.io.buoy
+    from nautical.io import create_buoy
+
+    # nautical builds the url of the page from the NDBC host, point it at the stub
+    nautical.io.buoy.get_noaa_forecast_url = lambda buoy: f"{server.url}/station_page.php?station={buoy}"
+
+    path = f"/station_page.php?station={station}"
+    sent = server.bytes_sent.get(path, 0)
+    buoy = create_buoy(station)
+    data = {}
+    if buoy is not None:
+        for key in variable_dict:
+            value = getattr(buoy.data, key, None)
+            if value is not None:
+                data[key] = float(value)
+    return data, server.bytes_sent.get(path, 0) - sent
+
+
+def run(stations, repeat, support_range):
+    '''Run the benchmark for each station.
+
+    :param stations: list of station IDs with a fixture
+    :param repeat: number of times each read is repeated
+    :param support_range: when False the stub server ignores the HTTP Range header
+    :return: list of results (dictionaries), one per station
+    '''
+    server = NdbcStubServer(support_range=support_range).start()
+    environ["NDBC_REALTIME_URL"] = f"{server.url}/data/realtime2"
+
+    # pylint: disable=import-outside-toplevel
+    from buoy_lookup import TotalBuoyVariables
+    from realtime import read_latest_realtime
+
+    results = []
+    for station in stations:
+        partial_times, full_times = [], []
+        for _ in range(repeat):
+            start = perf_counter()
+            partial = read_latest_realtime(station, TotalBuoyVariables)
+            partial_times.append(perf_counter() - start)
+
+            start = perf_counter()
+            full_data, full_bytes = full_read(server, station, TotalBuoyVariables)
+            full_times.append(perf_counter() - start)
+
+        results.append({
+            "station": station,
+            "partial_bytes": partial.bytes_read,
+            "partial_ms": round(median(partial_times) * 1000, 3),
+            "range_honored": partial.partial,
+            "full_bytes": full_bytes,
+            "full_ms": round(median(full_times) * 1000, 3),
+            "same_result": {key: float(value) for key, value in partial.data.items()} == full_data,
+        })
+
+    server.shutdown()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='realtime_benchmark',
+        description='compare the partial read of realtime2 files and the full station page parse',
+    )
+    stations = sorted(x[:-len(".txt")] for x in listdir(RealtimeFixtureDir) if x.endswith(".txt"))
+    parser.add_argument('-s', '--stations', type=str, nargs='+', default=stations)
+    parser.add_argument('-r', '--repeat', type=int, default=20)
+    parser.add_argument('--no-range', action='store_true', help='stub server ignores HTTP Range requests')
+    parser.add_argument('--json', action='store_true', help='output the results as json')
+    args = parser.parse_args()
+
+    output = run(args.stations, args.repeat, not args.no_range)
+    if args.json:
+        print(dumps(output, indent=2))
+    else:
+        print(f"{'station':<8} {'partial bytes':>14} {'partial ms':>11} {'full bytes':>11} {'full ms':>9}  match")
+        for result in output:
+            print(f"{result['station']:<8} {result['partial_bytes']:>14} {result['partial_ms']:>11} "
+                  f"{result['full_bytes']:>11} {result['full_ms']:>9}  {result['same_result']}")
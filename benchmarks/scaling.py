@@ -0,0 +1,119 @@
+#!/bin/python
+# Scaling benchmark of the city/buoy matching (scraper). Synthetic datasets of increasing
+# size are matched by each engine and the time and peak memory (tracemalloc) are reported.
+# The results of the engines are compared when more than one engine runs on a size.
+import argparse
+from json import dumps
+from os import getcwd
+from os.path import join, realpath, dirname
+import sys
+from time import perf_counter
+import tracemalloc
+from nautical.location import Point
+from nautical.noaa import Buoy
+from nautical.units import DistanceUnits
+from synthetic_data import generate_buoys, generate_cities
+
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+sys.path.insert(0, join(__location__, "../data"))
+
+# pylint: disable=wrong-import-position
+from scraper import MatchEngines
+
+DefaultCities = [10000, 30000, 100000]
+DefaultBuoys = [1000, 5000]
+
+
+def measure(engine, cities, buoys, dist, units):
+    '''Run an engine, then run it again with tracemalloc to find the peak memory.
+
+    :return: tuple of the result, seconds and peak memory (MB)
+    '''
+    start = perf_counter()
+    result = MatchEngines[engine](cities, buoys, dist, units)
+    elapsed = perf_counter() - start
+
+    tracemalloc.start()
+    MatchEngines[engine](cities, buoys, dist, units)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def run(city_sizes, buoy_sizes, engines, dist, max_pool_cities, seed):
+    '''Run each engine for each dataset size.
+
+    :param city_sizes: list of the number of cities
+    :param buoy_sizes: list of the number of buoys
+    :param engines: list of engine names (scraper.MatchEngines)
+    :param dist: max distance (miles) between the city and buoy
+    :param max_pool_cities: the pool engine is skipped for larger datasets (cities x buoys / 1000)
+    :param seed: seed for the datasets
+    :return: list of results (dictionaries), one per size and engine
+    '''
+    results = []
+    for buoy_count in buoy_sizes:
+        buoys = {
+            station: Buoy(station, location=Point.from_json(value))
+            for station, value in generate_buoys(buoy_count, seed).items()
+        }
+        for city_count in city_sizes:
+            cities = generate_cities(city_count, seed)
+            matched = {}
+            for engine in engines:
+                if engine == "pool" and city_count * buoy_count / 1000 > max_pool_cities:
+                    results.append({"cities": city_count, "buoys": buoy_count, "engine": engine, "skipped": True})
+                    continue
+                matched[engine], elapsed, peak = measure(engine, cities, buoys, dist, DistanceUnits.MILES)
+                results.append({
+                    "cities": city_count,
+                    "buoys": buoy_count,
+                    "engine": engine,
+                    "seconds": round(elapsed, 3),
+                    "cities_per_second": round(city_count / elapsed, 1) if elapsed else None,
+                    "peak_mb": round(peak, 1),
+                    "matched_cities": len(matched[engine]),
+                })
+
+            # every engine must find the same buoys for every city, there is nothing to
+            # compare (None) when fewer than two engines ran
+            same = None
+            if len(matched) > 1:
+                reference = next(iter(matched.values()))
+                same = all(
+                    {key: sorted(value["buoys"]) for key, value in other.items()} ==
+                    {key: sorted(value["buoys"]) for key, value in reference.items()}
+                    for other in matched.values()
+                )
+            for result in results[-len(engines):]:
+                result["same_result"] = same
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='scaling',
+        description='time and memory of the city/buoy matching vs the dataset size',
+    )
+    parser.add_argument('-c', '--cities', type=int, nargs='+', default=DefaultCities, help='number of cities (10k-1M)')
+    parser.add_argument('-b', '--buoys', type=int, nargs='+', default=DefaultBuoys, help='number of buoys (1k-50k)')
+    parser.add_argument('-e', '--engines', type=str, nargs='+', default=list(MatchEngines), choices=list(MatchEngines))
+    parser.add_argument('-d', '--distance', type=float, default=50.0, help='max distance (miles)')
+    parser.add_argument('--max-pool', type=float, default=10000.0,
+                        help='largest dataset (cities x buoys / 1000) for the pool engine')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='output the results as json')
+    args = parser.parse_args()
+
+    output = run(args.cities, args.buoys, args.engines, args.distance, args.max_pool, args.seed)
+    if args.json:
+        print(dumps(output, indent=2))
+    else:
+        print(f"{'cities':>8} {'buoys':>6} {'engine':<6} {'seconds':>9} {'cities/s':>10} {'peak MB':>8} {'matched':>8}  same")
+        for result in output:
+            if result.get("skipped"):
+                print(f"{result['cities']:>8} {result['buoys']:>6} {result['engine']:<6} {'skipped':>9}")
+                continue
+            print(f"{result['cities']:>8} {result['buoys']:>6} {result['engine']:<6} {result['seconds']:>9} "
+                  f"{result['cities_per_second']:>10} {result['peak_mb']:>8} {result['matched_cities']:>8}  "
+                  f"{'n/a' if result['same_result'] is None else result['same_result']}")
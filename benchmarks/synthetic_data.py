@@ -0,0 +1,178 @@
+#!/bin/python
+# Generate synthetic city and buoy datasets for the scaling tests of the city/buoy matching
+# (scraper). Buoys are placed offshore along coastlines around the world and most cities
+# are clustered along the same coastlines, the rest are spread inland. The output uses the
+# formats of uscities.csv and buoy_locations.json. ZIP code centroids (US coastlines) use
+# the format of the Census ZCTA gazetteer.
+import argparse
+import csv
+from json import dumps
+from math import cos, radians, sin
+from os import getcwd
+from os.path import join, realpath, dirname
+from random import Random
+
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+
+# Coarse coastlines, each is a list of (latitude, longitude) points
+Coastlines = {
+    "us_west": [(48.4, -124.7), (46.2, -124.0), (42.0, -124.3), (40.4, -124.4), (37.8, -122.5),
+                (34.4, -120.5), (34.0, -118.5), (32.7, -117.2)],
+    "us_gulf": [(25.1, -80.4), (26.1, -81.8), (27.9, -82.8), (29.9, -85.4), (30.3, -88.0),
+                (29.2, -90.0), (29.5, -94.0), (27.8, -97.4), (26.0, -97.2)],
+    "us_east": [(25.8, -80.1), (28.4, -80.6), (30.4, -81.4), (32.1, -80.9), (34.7, -76.7),
+                (35.2, -75.5), (36.9, -76.0), (38.9, -74.9), (40.5, -74.0), (41.2, -71.9),
+                (42.3, -70.9), (43.7, -70.2), (44.8, -66.9)],
+    "great_lakes": [(41.7, -87.5), (43.0, -87.9), (45.0, -87.6), (46.8, -92.1), (47.5, -87.9),
+                    (45.8, -84.7), (43.6, -82.5), (41.7, -83.4), (41.5, -81.7), (42.9, -78.9),
+                    (43.3, -76.4)],
+    "alaska": [(59.5, -151.5), (60.0, -146.0), (58.3, -134.4), (55.3, -131.6)],
+    "hawaii": [(21.3, -157.9), (19.7, -155.1)],
+    "europe_atlantic": [(36.0, -6.0), (38.7, -9.3), (43.4, -8.4), (46.2, -1.2), (48.4, -4.5),
+                        (50.1, -5.5), (51.5, 1.4), (53.4, 4.8), (55.0, 8.0), (57.7, 10.6),
+                        (59.0, 5.6), (62.5, 6.2)],
+    "mediterranean": [(36.7, -4.4), (41.4, 2.2), (43.3, 5.4), (44.4, 8.9), (41.9, 12.5),
+                      (40.8, 14.3), (38.1, 13.4), (37.9, 23.7), (40.6, 22.9)],
+    "east_asia": [(22.3, 114.2), (25.0, 119.5), (31.2, 121.5), (35.1, 129.0), (34.7, 135.2),
+                  (35.6, 139.8), (38.3, 141.0), (43.1, 141.3)],
+    "india": [(19.0, 72.8), (13.1, 80.3), (22.6, 88.4)],
+    "australia": [(-31.9, 115.9), (-34.9, 138.6), (-37.8, 144.9), (-33.9, 151.2), (-27.5, 153.0),
+                  (-19.3, 146.8)],
+    "south_america": [(10.5, -66.9), (-12.0, -77.0), (-33.0, -71.6), (-34.6, -58.4), (-23.0, -43.2)],
+    "africa": [(30.0, 31.2), (14.7, -17.4), (6.5, 3.4), (-33.9, 18.4), (-29.9, 31.0)],
+}
+
+# Fraction of the cities that are clustered along the coastlines
+CoastalFraction = 0.7
+
+# Kilometers per degree of latitude
+KmPerDegree = 111.19
+
+
+def _coast_point(rand):
+    '''Random point on a random segment of a coastline'''
+    coast = Coastlines[rand.choice(sorted(Coastlines))]
+    index = rand.randrange(len(coast) - 1)
+    (lat1, lon1), (lat2, lon2) = coast[index], coast[index + 1]
+    fraction = rand.random()
+    return lat1 + (lat2 - lat1) * fraction, lon1 + (lon2 - lon1) * fraction
+
+
+def _offset(lat, lon, north_km, east_km):
+    '''Move the point by a distance north and east (km)'''
+    lat = min(max(lat + north_km / KmPerDegree, -89.9), 89.9)
+    lon = lon + east_km / (KmPerDegree * max(cos(radians(lat)), 0.01))
+    return lat, (lon + 180.0) % 360.0 - 180.0
+
+
+def generate_buoys(count, seed=0):
+    '''Generate buoy locations, buoys are 0-150 km (exponential, mean 30 km) from a coastline.
+
+    :param count: number of buoys
+    :param seed: seed for the random locations
+    :return: dictionary of station -> {"latitude", "longitude", "altitude"}
+    '''
+    rand = Random(seed)
+    buoys = {}
+    for i in range(count):
+        lat, lon = _coast_point(rand)
+        distance = min(rand.expovariate(1.0 / 30.0), 150.0)
+        direction = rand.uniform(0.0, 360.0)
+        lat, lon = _offset(lat, lon, distance * cos(radians(direction)), distance * sin(radians(direction)))
+        buoys[f"S{i:06d}"] = {"latitude": round(lat, 3), "longitude": round(lon, 3), "altitude": 0.0}
+    return buoys
+
+
+def generate_cities(count, seed=0):
+    '''Generate cities, most are within ~60 km of a coastline, the rest are 100-800 km away.
+
+    :param count: number of cities
+    :param seed: seed for the random locations
+    :return: dictionary of city id -> city data (format of scraper.read_cities)
+    '''
+    rand = Random(seed + 1)
+    cities = {}
+    for i in range(count):
+        lat, lon = _coast_point(rand)
+        if rand.random() < CoastalFraction:
+            north, east = rand.gauss(0.0, 30.0), rand.gauss(0.0, 30.0)
+        else:
+            distance = rand.uniform(100.0, 800.0)
+            direction = rand.uniform(0.0, 360.0)
+            north, east = distance * cos(radians(direction)), distance * sin(radians(direction))
+        lat, lon = _offset(lat, lon, north, east)
+        city_id = str(1000000000 + i)
+        cities[city_id] = {
+            "city": f"City {i}",
+            "state_name": f"Region {i % 500}",
+            "lat": f"{lat:.4f}",
+            "lng": f"{lon:.4f}",
+            "id": city_id,
+        }
+    return cities
+
+
+def generate_zip_codes(count, seed=0):
+    '''Generate ZIP code centroids within ~60 km of the US coastlines.
+
+    :param count: number of ZIP codes (max 99999)
+    :param seed: seed for the random locations
+    :return: dictionary of ZIP code (5 digits) -> (latitude, longitude)
+    '''
+    rand = Random(seed + 2)
+    coasts = [x for x in sorted(Coastlines) if x.startswith("us_") or x == "great_lakes"]
+    codes = sorted(rand.sample(range(1000, 100000), count))
+    centroids = {}
+    for code in codes:
+        coast = Coastlines[rand.choice(coasts)]
+        index = rand.randrange(len(coast) - 1)
+        (lat1, lon1), (lat2, lon2) = coast[index], coast[index + 1]
+        fraction = rand.random()
+        lat, lon = _offset(lat1 + (lat2 - lat1) * fraction, lon1 + (lon2 - lon1) * fraction,
+                           rand.gauss(0.0, 30.0), rand.gauss(0.0, 30.0))
+        centroids[f"{code:05d}"] = (round(lat, 6), round(lon, 6))
+    return centroids
+
+
+def write_zip_codes(centroids, filename):
+    '''Write the ZIP code centroids in the format of the Census ZCTA gazetteer'''
+    with open(filename, "w", newline="") as gazetteer:
+        writer = csv.writer(gazetteer, delimiter="\t")
+        writer.writerow(["GEOID", "ALAND", "AWATER", "ALAND_SQMI", "AWATER_SQMI", "INTPTLAT", "INTPTLONG"])
+        for code, (lat, lon) in centroids.items():
+            writer.writerow([code, 0, 0, 0.0, 0.0, f"{lat:.6f}", f"{lon:.6f}"])
+
+
+def write_cities(cities, filename):
+    '''Write the cities in the format of uscities.csv'''
+    with open(filename, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["city", "city_ascii", "state_name", "lat", "lng", "id"])
+        for city in cities.values():
+            writer.writerow([city["city"], city["city"], city["state_name"], city["lat"], city["lng"], city["id"]])
+
+
+def write_buoys(buoys, filename):
+    '''Write the buoys in the format of buoy_locations.json'''
+    with open(filename, "w") as jsonfile:
+        jsonfile.write(dumps(buoys, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='synthetic_data',
+        description='generate synthetic city and buoy datasets',
+    )
+    parser.add_argument('-c', '--cities', type=int, default=10000, help='number of cities (10k-1M)')
+    parser.add_argument('-b', '--buoys', type=int, default=1000, help='number of buoys (1k-50k)')
+    parser.add_argument('-z', '--zip-codes', type=int, default=0, help='number of ZIP codes (max 99000)')
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', type=str, default=__location__, help='output directory')
+    args = parser.parse_args()
+
+    write_cities(generate_cities(args.cities, args.seed), join(args.output, "synthetic_cities.csv"))
+    write_buoys(generate_buoys(args.buoys, args.seed), join(args.output, "synthetic_buoys.json"))
+    print(f"Wrote {args.cities} cities and {args.buoys} buoys to {args.output}")
+    if args.zip_codes:
+        write_zip_codes(generate_zip_codes(args.zip_codes, args.seed), join(args.output, "synthetic_zcta.txt"))
+        print(f"Wrote {args.zip_codes} ZIP codes to {args.output}")
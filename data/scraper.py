@@ -4,18 +4,36 @@
 # buoys in that range it is not added to the output. The intention is to use the
 # script to shortcut the lookup time and keep a constant file in the repository
 import argparse
+from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import csv
+from io import BytesIO, TextIOWrapper
 from json import dumps, loads
-from os import getcwd
+from math import ceil, cos, floor, radians
+from os import getcwd, makedirs
 from os.path  import join, realpath, dirname
+import sys
+from urllib.request import urlopen
+from zipfile import ZipFile
+import zlib
+from haversine import haversine, Unit
 from nautical.io import get_buoy_sources
 from nautical.location import Point
-from nautical.noaa import SourceType
+from nautical.noaa import Buoy, SourceType
 from nautical.units import DistanceUnits
 
 __location__ = realpath(join(getcwd(), dirname(__file__)))
 
+# Location data of the lambda function, one file (shard) per country
+LocationDataDir = join(__location__, "../lambda/location_data")
+
+# National ZCTA gazetteer of the Census Gazetteer Files (zip archive with a single txt file)
+ZctaGazetteerUrl = "https://www2.census.gov/geo/docs/maps-data/data/gazetteer/2023_Gazetteer/2023_Gaz_zcta_national.zip"
+
+# The format of the ZIP code table is defined by the lambda function
+sys.path.insert(0, join(__location__, "../lambda"))
+from zipcodes import write_zip_table  # pylint: disable=wrong-import-position
+
 class LocalPoint(Point):
     def __init__(self, json_dict):
 
@@ -93,11 +111,25 @@ def save_buoy_information():
         jsonfile.write(dumps(buoy_locations, indent=2))
 
 
-def create_city_buoy_lookup(dist, units):
-    '''Create a json file that matches the buoys to the city if they are
-    within the specified distance
+def read_buoy_locations(filename=None):
+    '''Read the buoys saved by save_buoy_information (no network access)
+
+    :param filename: path to the buoy locations file (default buoy_locations.json)
+    :return: dictionary of station -> nautical.noaa.Buoy
+    '''
+    with open(filename or join(__location__, "buoy_locations.json"), "r") as jsonfile:
+        data = loads(jsonfile.read())
+
+    return {station: Buoy(station, location=Point.from_json(value)) for station, value in data.items()}
+
+
+def read_cities(filename=None):
+    '''Read the cities (id, name, state and coordinates) from a csv file in the
+    format of uscities.csv
+
+    :param filename: path to the csv file (default uscities.csv)
+    :return: dictionary of city id -> dictionary of the city data
     '''
-    source_data = get_buoy_information()
     # Find the column number for this information
     required_rows = {
         "city": None,
@@ -108,7 +140,7 @@ def create_city_buoy_lookup(dist, units):
     }
     csvdata = None
     cities = {}
-    with open(join(__location__, 'uscities.csv')) as csvfile:
+    with open(filename or join(__location__, 'uscities.csv')) as csvfile:
         csvdata = list(csv.reader(csvfile))
 
     if csvdata is not None:
@@ -122,7 +154,19 @@ def create_city_buoy_lookup(dist, units):
                 x: row[y] for x, y in required_rows.items()
             }})
 
+    return cities
+
+
+def match_cities_to_buoys(cities, buoys, dist, units):
+    '''Match the buoys to each city when they are within the specified distance
 
+    :param cities: dictionary of city id -> city data (see read_cities)
+    :param buoys: dictionary of station -> nautical.noaa.Buoy
+    :param dist: max distance between the city and buoy
+    :param units: nautical.units.DistanceUnits of the distance
+    :return: dictionary of city id -> city data and the list of buoys. Cities without
+    buoys in range are not included.
+    '''
     cities_with_buoys = {}
     # for each location find all buoys that are within 50 miles
     for city_id, city_data in cities.items():
@@ -130,7 +174,7 @@ def create_city_buoy_lookup(dist, units):
         buoy_ids_in_dist = []
         with ThreadPoolExecutor(max_workers=10) as executor:
             tmp_buoys_fnd_in_dist = {executor.submit(find_buoys_in_dist, city_location, buoy, dist, units):
-                                     buoy for _, buoy in source_data.items()}
+                                     buoy for _, buoy in buoys.items()}
 
             for futr in as_completed(tmp_buoys_fnd_in_dist):
                 buoy_ids_in_dist.extend([futr.result()])
@@ -140,6 +184,212 @@ def create_city_buoy_lookup(dist, units):
             cities_with_buoys[city_id] = {"buoys": buoy_ids_in_dist}
             cities_with_buoys[city_id].update(cities[city_id])
 
+    return cities_with_buoys
+
+
+def match_cities_to_buoys_grid(cities, buoys, dist, units):
+    '''Match the buoys to each city when they are within the specified distance. The
+    buoys are placed in a grid of cells that are `dist` wide (latitude), so only the
+    buoys in the cells around a city are compared instead of every buoy. The result
+    is the same as match_cities_to_buoys.
+
+    :param cities: dictionary of city id -> city data (see read_cities)
+    :param buoys: dictionary of station -> nautical.noaa.Buoy
+    :param dist: max distance between the city and buoy
+    :param units: nautical.units.DistanceUnits of the distance
+    :return: dictionary of city id -> city data and the list of buoys. Cities without
+    buoys in range are not included.
+    '''
+    # nautical uses the haversine package to find the distance between points
+    hav_units = getattr(Unit, str(units.name), Unit.METERS)
+    cell = dist / haversine((0.0, 0.0), (1.0, 0.0), hav_units)
+    columns = max(1, ceil(360.0 / cell))
+    rows = max(1, ceil(180.0 / cell))
+
+    def grid_cell(lat, lon):
+        return min(floor((lat + 90.0) / cell), rows - 1), floor((lon + 180.0) / cell) % columns
+
+    grid = defaultdict(list)
+    for station, buoy in buoys.items():
+        location = buoy.location.as_tuple()
+        grid[grid_cell(*location)].append((station, location))
+
+    cities_with_buoys = {}
+    for city_id, city_data in cities.items():
+        city_location = (float(city_data["lat"]), float(city_data["lng"]))
+        row, column = grid_cell(*city_location)
+
+        # a degree of longitude is shorter than a degree of latitude away from the equator
+        widest = abs(city_location[0]) + cell
+        span = columns if widest >= 90.0 else ceil(1.0 / cos(radians(widest)))
+        if 2 * span + 1 >= columns:
+            search_columns = range(columns)
+        else:
+            search_columns = [(column + x) % columns for x in range(-span, span + 1)]
+
+        buoy_ids_in_dist = [
+            station
+            for search_row in (row - 1, row, row + 1)
+            for search_column in search_columns
+            for station, location in grid.get((search_row, search_column), [])
+            if haversine(city_location, location, hav_units) <= dist
+        ]
+        if buoy_ids_in_dist:
+            cities_with_buoys[city_id] = {"buoys": buoy_ids_in_dist}
+            cities_with_buoys[city_id].update(cities[city_id])
+
+    return cities_with_buoys
+
+
+# Engines that match the cities to the buoys
+MatchEngines = {
+    "pool": match_cities_to_buoys,
+    "grid": match_cities_to_buoys_grid,
+}
+
+
+def read_world_cities(filename):
+    '''Read the cities from a world cities csv file (columns city_ascii, lat, lng,
+    iso2, admin_name and id). Files in the format of uscities.csv (state_name and no
+    country) are also accepted, the country of those cities is `us`.
+
+    :param filename: path to the csv file
+    :return: dictionary of city id -> dictionary of the city, region, country, lat, lng and id
+    '''
+    cities = {}
+    with open(filename) as csvfile:
+        for row in csv.DictReader(csvfile):
+            cities[row["id"]] = {
+                "city": row.get("city_ascii") or row["city"],
+                "region": row.get("admin_name") or row.get("state_name", ""),
+                "country": (row.get("iso2") or "us").lower(),
+                "lat": row["lat"],
+                "lng": row["lng"],
+                "id": row["id"],
+            }
+    return cities
+
+
+def chunk_filename(region):
+    '''Name of the chunk file of a region (ex. new york -> new_york.json.zlib)'''
+    return "_".join("".join(x if x.isalnum() else " " for x in region).split()) + ".json.zlib"
+
+
+def create_location_shards(cities, directory=None):
+    '''Save the gazetteer and the buoy locations as the location data of the lambda function.
+    The lambda finds the buoys near a city at request time, so the gazetteer only contains the
+    location of each city. The gazetteer is split in one zlib compressed chunk per region
+    (<country>/<region>.json.zlib, city -> [lat, lng]) so the lambda only decompresses the
+    regions that are requested. A manifest maps each region to its countries and chunks.
+    The buoy locations (`buoy_locations.json`) are saved to `buoys.json` (station -> [lat, lon]).
+
+    :param cities: dictionary of city id -> city data (lat, lng and the region or
+    state_name). Cities without a country are in the `us`.
+    :param directory: output directory (default LocationDataDir)
+    '''
+    directory = directory or LocationDataDir
+    makedirs(directory, exist_ok=True)
+
+    shards = defaultdict(dict)
+    for city_data in cities.values():
+        country = city_data.get("country", "us").lower()
+        region = city_data.get("region", city_data.get("state_name", "")).lower()
+        shards[country].setdefault(region, {})[city_data["city"].lower()] = [
+            float(city_data["lat"]), float(city_data["lng"])
+        ]
+
+    manifest = {"countries": {}, "regions": defaultdict(list), "chunks": {}}
+    for country, regions in sorted(shards.items()):
+        makedirs(join(directory, country), exist_ok=True)
+        manifest["chunks"][country] = {}
+        for region, region_cities in sorted(regions.items()):
+            filename = chunk_filename(region)
+            with open(join(directory, country, filename), "wb+") as chunkfile:
+                chunkfile.write(zlib.compress(dumps(region_cities, separators=(",", ":")).encode(), 9))
+            manifest["chunks"][country][region] = filename
+            manifest["regions"][region].append(country)
+
+        manifest["countries"][country] = {
+            "regions": len(regions), "cities": sum(len(x) for x in regions.values())
+        }
+
+    with open(join(directory, "manifest.json"), "w+") as jsonfile:
+        jsonfile.write(dumps(manifest, indent=2))
+
+    # the lambda serves the regions of one country (LOCATION_COUNTRY), regions with the same
+    # name are kept apart per country
+    shared = sorted(region for region, countries in manifest["regions"].items() if len(countries) > 1)
+    if shared:
+        print(dumps({"regions_in_multiple_countries": {x: manifest["regions"][x] for x in shared}}))
+
+    with open(join(__location__, "buoy_locations.json"), "r") as jsonfile:
+        buoys = {
+            station: [location["latitude"], location["longitude"]]
+            for station, location in loads(jsonfile.read()).items()
+        }
+    with open(join(directory, "buoys.json"), "w+") as jsonfile:
+        jsonfile.write(dumps(buoys, separators=(",", ":")))
+
+
+def parse_zcta_gazetteer(gazetteer):
+    '''Read the ZIP code centroids from the lines of a Census ZCTA gazetteer file (tab
+    separated, columns GEOID, INTPTLAT and INTPTLONG).
+
+    :param gazetteer: iterable of the lines in the file
+    :return: dictionary of ZIP code -> (latitude, longitude)
+    '''
+    centroids = {}
+    reader = csv.reader(gazetteer, delimiter="\t")
+    columns = [x.strip() for x in next(reader)]
+    geoid, lat, lng = columns.index("GEOID"), columns.index("INTPTLAT"), columns.index("INTPTLONG")
+    for row in reader:
+        if row:
+            centroids[row[geoid].strip()] = (float(row[lat]), float(row[lng]))
+    return centroids
+
+
+def read_zcta_gazetteer(filename):
+    '''Read the ZIP code centroids from a Census ZCTA gazetteer file, ex. 2020_Gaz_zcta_national.txt.
+
+    :param filename: path to the gazetteer file
+    :return: dictionary of ZIP code -> (latitude, longitude)
+    '''
+    with open(filename) as gazetteer:
+        return parse_zcta_gazetteer(gazetteer)
+
+
+def download_zcta_gazetteer(url=ZctaGazetteerUrl):
+    '''Download the national ZCTA gazetteer from the Census Gazetteer Files.
+
+    :param url: url of the zip archive of the gazetteer
+    :return: dictionary of ZIP code -> (latitude, longitude)
+    '''
+    with urlopen(url) as response:
+        archive = ZipFile(BytesIO(response.read()))
+    filename = next(x for x in archive.namelist() if x.endswith(".txt"))
+    with archive.open(filename) as gazetteer:
+        return parse_zcta_gazetteer(TextIOWrapper(gazetteer, encoding="utf-8"))
+
+
+def create_zip_table(filename=None, output=None):
+    '''Save the ZIP code centroids of a Census ZCTA gazetteer file as the ZIP code
+    table of the lambda function (binary, see lambda/zipcodes.py).
+
+    :param filename: path to the gazetteer file, the gazetteer is downloaded when None
+    :param output: path of the table (default location_data/zip_centroids.bin)
+    '''
+    output = output or join(LocationDataDir, "zip_centroids.bin")
+    centroids = read_zcta_gazetteer(filename) if filename else download_zcta_gazetteer()
+    write_zip_table(centroids, output)
+    print(dumps({"zip_codes": len(centroids), "table": output}))
+
+
+def create_city_buoy_lookup(dist, units, engine="pool"):
+    '''Create a json file that matches the buoys to the city if they are
+    within the specified distance
+    '''
+    cities_with_buoys = MatchEngines[engine](read_cities(), get_buoy_information(), dist, units)
+
     with open("cities_with_buoys.json", "w+") as jsonfile:
         jsonfile.write(dumps(cities_with_buoys, indent=2))
 
@@ -149,16 +399,28 @@ if __name__ == '__main__':
         prog='scraper',
         description='helper file for CI and base project purposes',
     )
-    parser.add_argument('-f', '--function', type=str, choices=['buoy', 'match', 'locations', 'diff', 'track_buoys', 'track_cities'], default='match')
+    parser.add_argument('-f', '--function', type=str, choices=['buoy', 'match', 'shards', 'zips', 'locations', 'diff', 'track_buoys', 'track_cities'], default='match')
     parser.add_argument('-d', '--distance', type=float, default=50.0, help='max distance between city and buoy for validation')
     unit_names = [x.name for x in DistanceUnits]
     parser.add_argument('-u', '--units', type=str, default='MILES', help='distance unit', choices=unit_names)
+    parser.add_argument('-e', '--engine', type=str, default='pool', choices=list(MatchEngines), help='city/buoy matching engine')
+    parser.add_argument('-c', '--cities', type=str, default=None, help='world cities csv file for the gazetteer (shards)')
+    parser.add_argument('-z', '--zcta', type=str, default=None, help='Census ZCTA gazetteer file for the ZIP code table (downloaded when not set)')
     args = parser.parse_args()
 
     if args.function == 'match':
         dist = args.distance
         units = [x for x in DistanceUnits if x.name == args.units][0]
-        create_city_buoy_lookup(dist, units)
+        create_city_buoy_lookup(dist, units, args.engine)
+    elif args.function == 'shards':
+        if args.cities:
+            cities = read_world_cities(args.cities)
+        else:
+            with open(join(__location__, "cities_with_buoys.json"), "r") as jsonfile:
+                cities = loads(jsonfile.read())
+        create_location_shards(cities)
+    elif args.function == 'zips':
+        create_zip_table(args.zcta)
     elif args.function == 'locations':
         create_location_lookup()
     elif args.function == 'buoy':
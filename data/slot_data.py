@@ -1,38 +1,217 @@
 #!/bin/python
-# This script is used create a csv file with the ids of the buoys. This is simply
-# to be used for importing data into the amazon web console for the BUOY_ID slot.
-from json import loads
+# This script is used create the values of the BUOY_ID, BUOY_VAR, AMAZON.City and
+# AMAZON.US_STATE slots. Each value has an ID and synonyms (entity resolution), the IDs are
+# the keys of the lambda location data (city and state names in lower case), the buoy
+# station IDs and the buoy variables, so the lambda can use the resolved IDs without any
+# string matching. The values are
+# written to csv files for importing data into the amazon web console and, optionally,
+# to the interaction model.
+import argparse
 import csv
+from json import dumps, loads
+from os import getcwd
+from os.path import exists, join, realpath, dirname
+import sys
 
-data = None
-with open("buoy_locations.json") as jsonfile:
-    data = loads(jsonfile.read())
-
-with open('buoy_slot.csv', 'w+') as csvfile:
-    writer = csv.writer(csvfile)
-    for k, _ in data.items():
-        writer.writerow([k])
-
-cities = []
-states = []
-data = None
-with open("cities_with_buoys.json") as jsonfile:
-    data = loads(jsonfile.read())
-    
-for _, v in data.items():
-    cities.append(v["city"])
-    states.append(v["state_name"])
-
-cities = list(set(cities))
-states = list(set(states))
-
-with open('city_slot.csv', 'w+') as csvfile:
-    writer = csv.writer(csvfile)
-    for city in cities:
-        writer.writerow([city])
-
-
-with open('state_slot.csv', 'w+') as csvfile:
-    writer = csv.writer(csvfile)
-    for state in states:
-        writer.writerow([state])
\ No newline at end of file
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+
+# The variables and their synonyms are defined by the lambda function
+sys.path.insert(0, join(__location__, "../lambda"))
+from buoy_lookup import TotalBuoyVariables, VariableSynonyms  # pylint: disable=wrong-import-position
+from zipcodes import ZipTableFile  # pylint: disable=wrong-import-position
+
+InteractionModel = join(__location__, "../interactionModels/custom/en-US.json")
+
+# Copy of the interaction model that is kept in sync with the model of the console
+InteractionModelCopy = join(__location__, "../model/interaction_model.json")
+
+# The intent is only part of the interaction model when the ZIP code table exists
+# (`scraper.py -f zips`), it is added after the intent of the same position in the console.
+ZipCodeIntent = {
+    "slots": [
+        {"name": "zip_code", "type": "AMAZON.NUMBER"},
+        {"name": "radius", "type": "AMAZON.NUMBER"},
+    ],
+    "name": "BuoysNearZipCode",
+    "samples": [
+        "what buoys are near {zip_code}",
+        "what buoys are near zip code {zip_code}",
+        "list buoys near zip code {zip_code}",
+        "what buoys are close to zip code {zip_code}",
+        "what buoys are within {radius} miles of zip code {zip_code}",
+        "list buoys within {radius} miles of zip code {zip_code}",
+    ],
+}
+ZipCodeIntentAfter = "BuoysNearLocation"
+
+# Spoken forms of the abbreviations in city names
+Abbreviations = {
+    "st.": ["saint", "st"],
+    "ste.": ["sainte"],
+    "mt.": ["mount", "mt"],
+    "ft.": ["fort", "ft"],
+    "pt.": ["point", "pt"],
+}
+
+# Spoken form of the digits in buoy IDs
+Digits = {
+    "0": "zero", "1": "one", "2": "two", "3": "three", "4": "four",
+    "5": "five", "6": "six", "7": "seven", "8": "eight", "9": "nine",
+}
+
+
+def city_synonyms(city):
+    '''Spoken variants of a city name (ex. St. Augustine -> saint augustine, st augustine)'''
+    words = city.lower().split()
+    variants = {" ".join(words).replace("-", " ")}
+    for i, word in enumerate(words):
+        for spoken in Abbreviations.get(word, []):
+            variants |= {" ".join(words[:i] + [spoken] + words[i + 1:]).replace("-", " ")}
+    variants.discard(city.lower())
+    return sorted(variants)
+
+
+def buoy_synonyms(station):
+    '''Spoken variants of a buoy ID (ex. 44025 -> 4 4 0 2 5, four four zero two five)'''
+    characters = list(station.upper())
+    return [" ".join(characters), " ".join(Digits.get(x, x) for x in characters)]
+
+
+def buoy_slot_values(filename="buoy_locations.json"):
+    '''Values of the BUOY_ID slot
+
+    :return: dictionary of value -> {"id": station ID, "synonyms": [...]}
+    '''
+    with open(join(__location__, filename)) as jsonfile:
+        data = loads(jsonfile.read())
+    return {k: {"id": k, "synonyms": buoy_synonyms(k)} for k in data}
+
+
+def variable_slot_values():
+    '''Values of the BUOY_VAR slot, the ID of a value is the nautical variable
+
+    :return: dictionary of value -> {"id": variable, "synonyms": [...]}
+    '''
+    return {
+        value[0]: {"id": key, "synonyms": VariableSynonyms.get(key, [])}
+        for key, value in TotalBuoyVariables.items()
+    }
+
+
+def location_slot_values(filename="cities_with_buoys.json"):
+    '''Values of the AMAZON.City and AMAZON.US_STATE slots. The ID of a city is the
+    name of the city in the location data, the state slot disambiguates cities that have
+    the same name.
+
+    :return: tuple of the dictionaries of city and state value -> {"id", "synonyms"}
+    '''
+    with open(join(__location__, filename)) as jsonfile:
+        data = loads(jsonfile.read())
+
+    cities = {}
+    states = {}
+    for v in data.values():
+        cities[v["city"]] = {"id": v["city"].lower(), "synonyms": city_synonyms(v["city"])}
+        states[v["state_name"]] = {"id": v["state_name"].lower(), "synonyms": []}
+    return cities, states
+
+
+def write_slot_csv(values, filename):
+    '''Write the slot values in the csv format of the console (value, id, synonyms...)'''
+    with open(filename, 'w+') as csvfile:
+        writer = csv.writer(csvfile)
+        for value, entity in values.items():
+            writer.writerow([value, entity["id"]] + entity["synonyms"])
+
+
+def update_slot_type(language_model, type_name, values):
+    '''Set the values of a slot type in the interaction model. The order of the existing
+    values is kept, new values are added to the end.
+
+    :param language_model: languageModel of the interaction model
+    :param type_name: name of the slot type
+    :param values: dictionary of value -> {"id", "synonyms"}
+    '''
+    slot_type = next((x for x in language_model["types"] if x["name"] == type_name), None)
+    if slot_type is None:
+        slot_type = {"name": type_name, "values": []}
+        language_model["types"].append(slot_type)
+
+    existing = [x["name"]["value"] for x in slot_type["values"] if x["name"]["value"] in values]
+    order = existing + [x for x in values if x not in set(existing)]
+
+    slot_type["values"] = []
+    for value in order:
+        name = {"value": value}
+        if values[value]["synonyms"]:
+            name["synonyms"] = values[value]["synonyms"]
+        slot_type["values"].append({"id": values[value]["id"], "name": name})
+
+
+def update_zip_code_intent(language_model, table=ZipTableFile):
+    '''Add the BuoysNearZipCode intent to the interaction model when the ZIP code table
+    exists, otherwise remove the intent (the lambda could only apologize).
+
+    :param language_model: languageModel of the interaction model
+    :param table: path of the ZIP code table
+    '''
+    intents = [x for x in language_model["intents"] if x["name"] != ZipCodeIntent["name"]]
+    if exists(table):
+        names = [x["name"] for x in intents]
+        position = names.index(ZipCodeIntentAfter) + 1 if ZipCodeIntentAfter in names else len(intents)
+        intents.insert(position, ZipCodeIntent)
+    language_model["intents"] = intents
+
+
+def write_interaction_model(model, model_path=InteractionModel, copy_path=InteractionModelCopy):
+    '''Write the interaction model and its copy (model/interaction_model.json)'''
+    # keep the format of the model exported by the console
+    with open(model_path, "w") as model_file:
+        model_file.write(dumps(model, indent=2, ensure_ascii=False).replace("'", "\\u0027"))
+    with open(copy_path, "w") as model_file:
+        model_file.write(dumps(model, indent=4) + "\n")
+
+
+def update_interaction_model(buoys, variables, cities, states, model_path=InteractionModel):
+    '''Write the slot values with their IDs and synonyms to the interaction model'''
+    with open(model_path, "r") as model_file:
+        model = loads(model_file.read())
+
+    language_model = model["interactionModel"]["languageModel"]
+    update_slot_type(language_model, "BUOY_ID", buoys)
+    update_slot_type(language_model, "BUOY_VAR", variables)
+    update_slot_type(language_model, "AMAZON.City", cities)
+    update_slot_type(language_model, "AMAZON.US_STATE", states)
+    update_zip_code_intent(language_model)
+
+    write_interaction_model(model, model_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='slot_data',
+        description='create the values of the BUOY_ID, BUOY_VAR, AMAZON.City and AMAZON.US_STATE slots',
+    )
+    parser.add_argument('-m', '--model', action='store_true', help='update the interaction model')
+    parser.add_argument('-s', '--sync', action='store_true',
+                        help='only copy the interaction model to model/interaction_model.json (and add or remove the zip code intent)')
+    args = parser.parse_args()
+
+    if args.sync:
+        with open(InteractionModel, "r") as model_file:
+            model = loads(model_file.read())
+        update_zip_code_intent(model["interactionModel"]["languageModel"])
+        write_interaction_model(model)
+        sys.exit(0)
+
+    buoys = buoy_slot_values()
+    variables = variable_slot_values()
+    cities, states = location_slot_values()
+
+    write_slot_csv(buoys, 'buoy_slot.csv')
+    write_slot_csv(variables, 'variable_slot.csv')
+    write_slot_csv(cities, 'city_slot.csv')
+    write_slot_csv(states, 'state_slot.csv')
+
+    if args.model:
+        update_interaction_model(buoys, variables, cities, states)
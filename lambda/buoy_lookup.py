@@ -20,6 +20,7 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+from functools import lru_cache
 from sys import version_info
 
 
@@ -59,14 +60,142 @@ else:
 
 ReverseVarsLookup = {value[0]: key for key, value in TotalBuoyVariables.items()}
 
+# Other ways to say each variable. The synonyms are also the synonyms of the BUOY_VAR
+# slot values (data/slot_data.py).
+VariableSynonyms = {
+    "wvht": ["waves", "wave size", "surf", "surf height", "sea height", "significant wave height"],
+    "apd": ["average period", "average wave period", "wave period", "mean wave period"],
+    "wtmp": ["water temp", "water", "sea temperature", "sea temp", "ocean temperature", "temperature"],
+    "depth": ["water depth"],
+    "wwp": ["wind wave interval"],
+    "swp": ["swell interval"],
+    "wwh": ["wind waves", "chop"],
+    "swh": ["swell", "swells", "swell size"],
+    "tide": ["tides", "tide level", "water level"],
+    "vis": ["how far can I see"],
+    "sal": ["salt", "salt content"],
+    "dewp": ["dewpoint", "dew"],
+    "atmp": ["air temp", "air", "outside temperature"],
+    "pres": ["air pressure", "barometric pressure", "barometer"],
+    "dpd": ["dominant wave period", "peak period", "peak wave period"],
+    "wspd": ["wind", "winds", "wind strength"],
+    "gst": ["gusts", "wind gust", "wind gusts", "gusting"],
+}
+
+# Words that do not change the variable (ex. `what is the wave height`)
+StopWords = {"a", "an", "the", "what", "whats", "is", "are", "of", "at", "current", "currently", "right", "now"}
+
+
+def stem(word):
+    """Remove the plural or verb suffix of a word (ex. gusts -> gust, gusting -> gust)"""
+    for suffix in ("ing", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            return word[:-len(suffix)]
+    return word
+
+
+def normalize_variable(phrase):
+    """Normalize a spoken variable, the words are lower case and stemmed and the stop
+    words are removed.
+
+    :param phrase: spoken variable
+    :return: normalized phrase
+    """
+    words = "".join(x if x.isalnum() else " " for x in phrase.lower()).split()
+    return " ".join(stem(x) for x in words if x not in StopWords)
+
+
+def _index_variables():
+    """Create the dictionary of the normalized names and synonyms to the variable"""
+    index = {}
+    for key, value in TotalBuoyVariables.items():
+        for phrase in [value[0]] + VariableSynonyms.get(key, []):
+            index.setdefault(normalize_variable(phrase), key)
+    return index
+
+
+# Normalized name or synonym -> variable
+VariableIndex = _index_variables()
+
+# BK-tree of the index, created by the first phrase that is not in the index
+_variable_tree = None
+
+
+def _max_edits(phrase):
+    """Number of edits that a phrase can be away from a variable. Short words must match
+    exactly, one edit turns most of them into another word (ex. time -> tide).
+    """
+    return 0 if len(phrase) <= 4 else 1 if len(phrase) <= 5 else 2 if len(phrase) <= 12 else 3
+
+
+@lru_cache(maxsize=1024)
+def _closest_variable(phrase):
+    """Find the variable whose name or synonym is the fewest edits away from a phrase
+    that is not in the index (ex. misheard words).
+    """
+    global _variable_tree
+    from resolvers import BKTree  # pylint: disable=import-outside-toplevel
+
+    max_edits = _max_edits(phrase)
+    if not max_edits:
+        # the exact phrase was already searched in the index
+        return None
+
+    if _variable_tree is None:
+        _variable_tree = BKTree(VariableIndex)
+
+    found = _variable_tree.search(phrase, max_edits)
+    return VariableIndex[found[0][0]] if found else None
+
 
 def find_buoy_variable(spoken_buoy_var):
-    """Find the variable in the buoy from spoken words.
+    """Find the variable in the buoy from spoken words. The phrase is matched to the
+    names and synonyms of the variables (`VariableSynonyms`), then to the closest name or
+    synonym within a few edits.
 
     :param spoken_buoy_var: phrase entered by the user representing a buoy variable
     :return: The shortened name of the buoy variable or None when nothing was foudn
     """
+    if not spoken_buoy_var:
+        return None
+
     if spoken_buoy_var.lower() in ReverseVarsLookup:
         return ReverseVarsLookup[spoken_buoy_var.lower()]
 
-    return None
+    phrase = normalize_variable(spoken_buoy_var)
+    if phrase in VariableIndex:
+        return VariableIndex[phrase]
+
+    return _closest_variable(phrase)
+
+
+# Words that separate the variables of a spoken list (ex. wind speed and gusts)
+VariableSeparators = {"and", "plus", "&"}
+
+
+def find_buoy_variables(spoken_buoy_vars):
+    """Find the variables of a spoken list of variables. A phrase without separators (and,
+    commas) is a single variable.
+
+    :param spoken_buoy_vars: phrase entered by the user (ex. `wind speed and gusts`)
+    :return: list of the shortened names of the variables that were found, in the spoken
+    order without duplicates
+    """
+    if not spoken_buoy_vars:
+        return []
+
+    parts, words = [], []
+    for word in spoken_buoy_vars.replace(",", " , ").split():
+        if word == "," or word.lower() in VariableSeparators:
+            parts.append(" ".join(words))
+            words = []
+        else:
+            words.append(word)
+    parts.append(" ".join(words))
+
+    variables = []
+    for part in parts:
+        variable = find_buoy_variable(part)
+        if variable is not None and variable not in variables:
+            variables.append(variable)
+    return variables
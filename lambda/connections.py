@@ -0,0 +1,59 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from ssl import create_default_context
+from threading import Lock
+from urllib.request import HTTPSHandler, build_opener, install_opener
+
+
+_opener = None
+_opener_lock = Lock()
+
+
+def get_opener():
+    """Get the opener shared by all requests to NDBC. Creating the SSL context (loading
+    the CA certificates) is expensive, so it is created once instead of per connection.
+    The opener is also installed as the default opener so that nautical uses it.
+
+    :return: urllib.request.OpenerDirector
+    """
+    global _opener
+
+    if _opener is None:
+        with _opener_lock:
+            if _opener is None:
+                opener = build_opener(HTTPSHandler(context=create_default_context()))
+                install_opener(opener)
+                _opener = opener
+    return _opener
+
+
+def open_url(url, timeout=None):
+    """Open a url (or urllib.request.Request) with the shared opener.
+
+    :param url: url or urllib.request.Request
+    :param timeout: number of seconds to wait for the server, None for the default
+    :return: http response
+    """
+    if timeout is None:
+        return get_opener().open(url)
+    return get_opener().open(url, timeout=timeout)
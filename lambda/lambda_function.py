@@ -27,44 +27,370 @@ The skill will use the nautical library to retrieve information about
 noaa buoys.
 """
 import logging
-from statistics import mean
-from collections import defaultdict
-from locations import Location_Breakdown
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from os import environ
+from time import perf_counter
 import ask_sdk_core.utils as ask_utils
 from ask_sdk_core.skill_builder import SkillBuilder
 from ask_sdk_core.dispatch_components import AbstractRequestHandler
 from ask_sdk_core.dispatch_components import AbstractExceptionHandler
+from ask_sdk_core.dispatch_components import AbstractRequestInterceptor
+from ask_sdk_core.dispatch_components import AbstractResponseInterceptor
 from ask_sdk_core.handler_input import HandlerInput
 from ask_sdk_model import Response
-from nautical.io import create_buoy
-from buoy_lookup import BaseVariables, TotalBuoyVariables, find_buoy_variable
-
+from ask_sdk_model.list_slot_value import ListSlotValue
+from ask_sdk_model.slu.entityresolution import StatusCode
+from buoy_lookup import BaseVariables, TotalBuoyVariables, find_buoy_variable, find_buoy_variables
+from lazy import LazyObject, lazy_import
+from metrics import bind_fetches, finish_invocation, record_fetch, start_invocation, timed
+from profiling import profile_handler
+from warmup import initialize
+
+# The dependencies below are expensive to import
+# and are not used by every request (ex. Launch, Help, SessionEnded). They are imported
+# by the first handler that uses them.
+Location_Breakdown = lazy_import("locations", "Location_Breakdown")
+find_buoys = lazy_import("locations", "find_buoys")
+find_buoys_near = lazy_import("locations", "find_buoys_near")
+Location_Resolver = lazy_import("locations", "Location_Resolver")
+resolve_station = lazy_import("locations", "resolve_station")
+buoy_names = lazy_import("locations", "buoy_names")
+Zip_Codes = lazy_import("zipcodes", "Zip_Codes")
+normalize_zip_code = lazy_import("zipcodes", "normalize_zip_code")
+ThreadPoolExecutor = lazy_import("concurrent.futures", "ThreadPoolExecutor")
+wait_for_futures = lazy_import("concurrent.futures", "wait")
+create_buoy = lazy_import("nautical.io", "create_buoy")
+StationCache = lazy_import("observations", "StationCache")
+get_observation_table = lazy_import("observations", "get_observation_table")
+rank_observations = lazy_import("observations", "rank_observations")
+reduce_observations = lazy_import("observations", "reduce_observations")
+stack_observations = lazy_import("observations", "stack_observations")
+to_observation_array = lazy_import("observations", "to_observation_array")
+read_latest_realtime = lazy_import("realtime", "read_latest_realtime")
+LatestObservationColumns = lazy_import("observations", "LatestObservationColumns")
+SessionObservations = lazy_import("session", "SessionObservations")
+get_rollup_tree = lazy_import("rollups", "get_rollup_tree")
+get_opener = lazy_import("connections", "get_opener")
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+# When enabled, buoy data is read from the NDBC latest observations (one download for
+# all stations) before falling back to retrieving the data for each station.
+UseLatestObservations = environ.get("USE_LATEST_OBS", "false").lower() in ("1", "true", "yes")
+
+# When enabled, only the newest rows of the NDBC realtime2 file are read for a station
+# before falling back to the full nautical (station page) parse.
+UseRealtime = environ.get("USE_REALTIME", "true").lower() in ("1", "true", "yes")
+
+# Data retrieved for individual stations, shared by all handlers in the container
+station_cache = LazyObject(lambda: StationCache())
+
+# Seconds to wait for the buoys of a location before answering with the buoys that
+# responded (Alexa gives up on the skill after 8 seconds)
+FetchDeadline = float(environ.get("FETCH_DEADLINE", 4.0))
+
+# Number of buoys spoken for ranking requests
+RankedBuoys = 3
+
+# Reprompt of the responses that keep the session open for follow-up questions
+FollowUpPrompt = "What else would you like to know about the buoy?"
+
+# Response of the requests that failed (CatchAllExceptionHandler)
+ErrorSpeech = "Sorry, I had trouble doing what you asked. Please try again."
+
+# Host of the station pages parsed by nautical (create_buoy)
+StationPageHost = "www.ndbc.noaa.gov"
+
+
+def get_slot_id(slot):
+    """Get the ID of the value that the slot was resolved to (entity resolution). The IDs
+    of the city and state values are the keys of the location data and the IDs of the
+    buoy values are the station IDs (see data/slot_data.py).
+
+    :param slot: slot of the intent
+    :return: ID of the first match, None when the value was not resolved
+    """
+    resolutions = getattr(slot, "resolutions", None)
+    if slot is None or resolutions is None:
+        return None
+    for authority in resolutions.resolutions_per_authority or []:
+        if authority.status is not None and authority.status.code == StatusCode.ER_SUCCESS_MATCH and authority.values:
+            return authority.values[0].value.id
+    return None
+
+
+def get_slot_values(slot):
+    """Get the values of a slot that accepts multiple values (ex. `wind speed and gusts`).
+    Slots with a single value return a list with one value.
+
+    :param slot: slot of the intent
+    :return: list of (spoken value, ID of the resolved value or None) tuples
+    """
+    if slot is None:
+        return []
+    slot_value = getattr(slot, "slot_value", None)
+    values = slot_value.values if isinstance(slot_value, ListSlotValue) else [slot]
+    return [(x.value, get_slot_id(x)) for x in values or [] if x is not None and x.value]
+
+
+def get_slot_variables(slot):
+    """Get the buoy variables requested with a BUOY_VAR slot. Resolved values use the ID,
+    other values are matched with `find_buoy_variables` (a single value may be a spoken
+    list of variables).
+
+    :param slot: slot of the intent
+    :return: list of variables (keys of TotalBuoyVariables), in the spoken order
+    """
+    variables = []
+    for value, value_id in get_slot_values(slot):
+        for variable in [value_id] if value_id else find_buoy_variables(value):
+            if variable in TotalBuoyVariables and variable not in variables:
+                variables.append(variable)
+    return variables
+
+
+def unknown_buoy_speech(buoy_id, suggestions):
+    """Response for a buoy ID that is not a known station
+
+    :param buoy_id: spoken buoy ID
+    :param suggestions: stations that are closest to the spoken ID
+    """
+    speak_output = f"I could not find the buoy {buoy_id}."
+    if suggestions:
+        speak_output += f" Did you mean {', or '.join(buoy_names(suggestions))}?"
+    return speak_output
+
+
+def get_radius(slots):
+    """Get the distance (miles) requested with the radius slot.
+
+    :param slots: slots of the intent
+    :return: radius, None when the radius was not requested (or is not a positive number)
+    """
+    slot = slots.get("radius")
+    if slot is None or not slot.value:
+        return None
+    try:
+        radius = float(slot.value)
+    except ValueError:
+        return None
+    return radius if radius > 0 else None
+
 
 def create_buoy_wrapper(buoy_id, variable_dict=None):
     """Create buoy wrapper (nautical.io.create_buoy) to retrieve all data
     from the buoy. Only variables in the variable dictionary are retrieved.
+    When USE_LATEST_OBS is enabled the latest observation table is searched first, the
+    variables that the table did not report are retrieved for the station. Then the data
+    recently retrieved for the station is reused. When USE_REALTIME is enabled
+    the newest realtime2 observation is read before the full nautical parse, the station
+    page is then only parsed for the variables that realtime2 does not report. The station
+    page is not read when realtime2 timed out or failed (5xx).
+
+    :param buoy_id: ID or name of the buoy (station)
+    :param variable_dict: dictionary where the keys control what variables are returned
+
+    :return: dictionary of data retrieved from the buoy (if existed)
+    """
+    if variable_dict is None:
+        variable_dict = BaseVariables
+
+    if UseLatestObservations:
+        table = get_observation_table()
+        if table is not None and buoy_id in table:
+            table_data = table.get(buoy_id, variable_dict)
+            if all(key in table_data for key in variable_dict):
+                return table_data
+
+            # the variables that the table did not report (MM) are retrieved for the station
+            pulled_data = {
+                **_fetch_buoy(buoy_id, {key: value for key, value in variable_dict.items() if key not in table_data}),
+                **table_data
+            }
+            return {key: pulled_data[key] for key in variable_dict if key in pulled_data}
+
+    return _fetch_buoy(buoy_id, variable_dict)
+
+
+def _fetch_buoy(buoy_id, variable_dict):
+    """Retrieve the data of a buoy from the station cache, realtime2 or the station page
+    (see create_buoy_wrapper).
+
+    :param buoy_id: ID or name of the buoy (station)
+    :param variable_dict: dictionary where the keys control what variables are returned
+
+    :return: dictionary of data retrieved from the buoy (if existed)
+    """
+    pulled_data = station_cache.get(buoy_id, variable_dict)
+    if pulled_data is not None:
+        return pulled_data
+
+    with timed("buoy_fetch"):
+        pulled_data = {}
+        # the station page does not report the time of the observation
+        observed = None
+        page_variables = list(variable_dict)
+        if UseRealtime:
+            start = perf_counter()
+            read = read_latest_realtime(buoy_id, variable_dict)
+            record_fetch(buoy_id, read.host, (perf_counter() - start) * 1000, read.bytes_read, read.outcome)
+            pulled_data = read.data
+            observed = read.observed
+            if read.outcome == "timeout" or (read.status or 0) >= 500:
+                # the station page is served by the same host that just timed out or
+                # failed, the failure is not cached so the next request tries again. A
+                # station without a realtime2 file (404) is read from the station page.
+                return pulled_data
+            if pulled_data:
+                # the station page is only needed for the variables that realtime2 does not report
+                page_variables = [key for key in variable_dict if key not in LatestObservationColumns]
+
+        if page_variables:
+            start = perf_counter()
+            outcome = "error"
+            try:
+                buoy = create_buoy(buoy_id)
+                page_data = {}
+                if buoy is not None:
+                    page_data = {key: getattr(buoy.data, key) for key in page_variables if getattr(buoy.data, key) is not None}
+                outcome = "ok" if page_data else "empty"
+                pulled_data.update(page_data)
+                pulled_data = {key: pulled_data[key] for key in variable_dict if key in pulled_data}
+            except Exception as error:  # pylint: disable=broad-except
+                # nautical raises whatever urllib or the parser raised, the failure is
+                # not cached so the next request tries again
+                logger.warning("Failed to read the station page for %s: %s", buoy_id, error)
+                return pulled_data
+            finally:
+                # nautical does not expose the size of the station page
+                record_fetch(buoy_id, StationPageHost, (perf_counter() - start) * 1000, 0, outcome)
+
+    station_cache.put(buoy_id, variable_dict, pulled_data, observed)
+    return pulled_data
+
+
+def observation_time(buoy_id, variable_dict=None):
+    """Time of the observation that create_buoy_wrapper returned for a buoy. When the data
+    was merged from the latest observation table and the station the oldest time is used.
 
     :param buoy_id: ID or name of the buoy (station)
+    :param variable_dict: dictionary of the variables that were requested
+
+    :return: epoch time (UTC) of the observation, None when the observation time is
+    unknown or the buoy was not retrieved
+    """
+    if variable_dict is None:
+        variable_dict = BaseVariables
+
+    if UseLatestObservations:
+        table = get_observation_table()
+        if table is not None and buoy_id in table:
+            observed = table.observed_time(buoy_id)
+            table_data = table.get(buoy_id, variable_dict)
+            if all(key in table_data for key in variable_dict):
+                return observed
+            fetched = station_cache.observed_time(buoy_id)
+            return min((x for x in (observed, fetched) if x is not None), default=None)
+
+    return station_cache.observed_time(buoy_id)
+
+
+def report_variables():
+    """Variables retrieved by a buoy report. The report speaks the base variables, the other
+    variables are kept in the session for follow-up questions. When USE_REALTIME is enabled
+    only the variables of the realtime2 files (and latest observation table) are requested,
+    so the report does not fall back to the station page for variables that the realtime2
+    file never reports.
+
+    :return: dictionary of the variables (subset of TotalBuoyVariables)
+    """
+    if not UseRealtime:
+        return TotalBuoyVariables
+    return {key: value for key, value in TotalBuoyVariables.items() if key in BaseVariables or key in LatestObservationColumns}
+
+
+def get_session_buoy_data(handler_input, buoy_id, variable_dict=None):
+    """Get the data of a buoy for a request. The observations retrieved earlier in the
+    session are reused (no NDBC requests), other data is retrieved with create_buoy_wrapper
+    and saved in the session.
+
+    :param handler_input: input of the request handler
+    :param buoy_id: ID of the buoy (station)
     :param variable_dict: dictionary where the keys control what variables are returned
 
     :return: dictionary of data retrieved from the buoy (if existed)
     """
     if variable_dict is None:
         variable_dict = BaseVariables
-    buoy = create_buoy(buoy_id)
-    
-    pulled_data = {}
-    if buoy is not None:
-        pulled_data = {key: getattr(buoy.data, key) for key in variable_dict if getattr(buoy.data, key) is not None}
-    
+
+    observations = SessionObservations(handler_input.attributes_manager.session_attributes)
+    pulled_data = observations.get(buoy_id, variable_dict)
+    if pulled_data is None:
+        pulled_data = create_buoy_wrapper(buoy_id, variable_dict)
+        if pulled_data:
+            observations.put(buoy_id, variable_dict, pulled_data, observation_time(buoy_id, variable_dict))
     return pulled_data
 
 
+def collect_observations(buoy_ids, variable_dict=None, deadline=None):
+    """Retrieve the data for a group of buoys. When USE_LATEST_OBS is enabled the
+    buoys that reported every variable in the latest observation table are read from the
+    table, all other buoys are retrieved with create_buoy_wrapper. Buoys that have not responded within
+    `deadline` seconds are left out of the result (partial results).
+
+    :param buoy_ids: list of the IDs of the buoys (stations)
+    :param variable_dict: dictionary where the keys control what variables are returned
+    :param deadline: seconds to wait for the buoys (default FETCH_DEADLINE)
+
+    :return: tuple of the list of buoys and the structured array
+    (observations.ObservationType) with one row per buoy
+    """
+    if variable_dict is None:
+        variable_dict = BaseVariables
+    if deadline is None:
+        deadline = FetchDeadline
+
+    stations = []
+    observations = []
+    remaining = buoy_ids
+    if UseLatestObservations:
+        table = get_observation_table()
+        if table is not None:
+            found, rows, remaining = table.take(buoy_ids, variable_dict)
+            stations.extend(found)
+            observations.append(rows)
+
+    if remaining:
+        executor = ThreadPoolExecutor(max_workers=10)
+        try:
+            # buoys that miss the deadline are recorded in the fetches of this invocation
+            fetch_buoy = bind_fetches(create_buoy_wrapper)
+            find_buoy_data = {executor.submit(fetch_buoy, buoy_id, variable_dict):
+                buoy_id for buoy_id in remaining}
+            done, late = wait_for_futures(find_buoy_data, timeout=deadline)
+        finally:
+            # do not wait for the buoys that missed the deadline
+            executor.shutdown(wait=False)
+
+        for futr in late:
+            futr.cancel()
+        if late:
+            logger.warning("Buoys %s missed the %.1f second deadline", sorted(find_buoy_data[x] for x in late), deadline)
+
+        fetched = []
+        for futr in done:
+            try:
+                fetched.append((find_buoy_data[futr], futr.result()))
+            except Exception as error:  # pylint: disable=broad-except
+                # one failed buoy is left out instead of failing the whole location
+                logger.warning("Failed to retrieve buoy %s: %s", find_buoy_data[futr], error)
+                record_fetch(find_buoy_data[futr], StationPageHost, 0.0, 0, "error")
+        stations.extend([buoy_id for buoy_id, _ in fetched])
+        observations.append(to_observation_array([data for _, data in fetched]))
+
+    return stations, stack_observations(observations)
+
+
 class LaunchRequestHandler(AbstractRequestHandler):
     """Handler for Skill Launch."""
     def can_handle(self, handler_input):
@@ -83,28 +409,37 @@ class LaunchRequestHandler(AbstractRequestHandler):
 
 
 class BuoyIntentHandler(AbstractRequestHandler):
-    """Handler to provide information about a specific buoy.
+    """Handler to provide information about a specific buoy. The other variables of the
+    buoy are kept in the session for follow-up questions (SpecificDataAtBuoy).
     """
     def can_handle(self, handler_input):
         # type: (HandlerInput) -> bool
         return ask_utils.is_intent_name("Buoy")(handler_input)
 
     def handle(self, handler_input):
-        buoy_id = handler_input.request_envelope.request.intent.slots["buoy_id"].value
-        
-        pulled_data = create_buoy_wrapper(buoy_id)
-        if pulled_data:
-            speak_output = ", ".join(
-                [f"{BaseVariables[key][0]} is {value} {BaseVariables[key][1]}"
-                 for key, value in pulled_data.items()]
-            )
+        with timed("slot_parsing"):
+            buoy_id = handler_input.request_envelope.request.intent.slots["buoy_id"].value
+            station = get_slot_id(handler_input.request_envelope.request.intent.slots["buoy_id"]) or buoy_id
+
+        with timed("location_lookup"):
+            station, suggestions = resolve_station(station)
+
+        if station is None:
+            speak_output = unknown_buoy_speech(buoy_id, suggestions)
         else:
-            speak_output = f"I was not able to find data for {buoy_id}"
-        
+            pulled_data = get_session_buoy_data(handler_input, station, report_variables())
+            with timed("speech_rendering"):
+                speak_output = ", ".join(
+                    [f"{value[0]} is {pulled_data[key]} {value[1]}"
+                     for key, value in BaseVariables.items() if key in pulled_data]
+                )
+                if not speak_output:
+                    speak_output = f"I was not able to find data for {buoy_id}"
+
         return (
             handler_input.response_builder
                 .speak(speak_output)
-                # .ask("add a reprompt if you want to keep the session open for the user to respond")
+                .ask(FollowUpPrompt)
                 .response
         )
 
@@ -119,11 +454,16 @@ class BuoysNearLocationIntentHandler(AbstractRequestHandler):
 
     def handle(self, handler_input):
         # type: (HandlerInput) -> Response
-        city = handler_input.request_envelope.request.intent.slots["near_city"].value
-        state = handler_input.request_envelope.request.intent.slots["near_state"].value
+        with timed("slot_parsing"):
+            city = handler_input.request_envelope.request.intent.slots["near_city"].value
+            state = handler_input.request_envelope.request.intent.slots["near_state"].value
+            city_id = get_slot_id(handler_input.request_envelope.request.intent.slots["near_city"]) or city.lower()
+            state_id = get_slot_id(handler_input.request_envelope.request.intent.slots["near_state"]) or state.lower()
+            radius = get_radius(handler_input.request_envelope.request.intent.slots)
         
         try:
-            buoys = Location_Breakdown[state.lower()][city.lower()]["names"]
+            with timed("location_lookup"):
+                buoys = buoy_names(find_buoys(state_id, city_id, radius))
             buoy_str = ", ".join(buoys)
             speak_output = f"I found the following buoys. {buoy_str}"
         except KeyError as e:
@@ -137,6 +477,43 @@ class BuoysNearLocationIntentHandler(AbstractRequestHandler):
         )
 
 
+class BuoysNearZipCodeIntentHandler(AbstractRequestHandler):
+    """Handler to provide the buoys that can be found close to the centroid of a
+    ZIP code.
+    """
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return ask_utils.is_intent_name("BuoysNearZipCode")(handler_input)
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+        with timed("slot_parsing"):
+            zip_value = handler_input.request_envelope.request.intent.slots["zip_code"].value
+            radius = get_radius(handler_input.request_envelope.request.intent.slots)
+            zip_code = normalize_zip_code(zip_value)
+
+        with timed("location_lookup"):
+            centroid = Zip_Codes.lookup(zip_code) if zip_code is not None else None
+            if centroid is not None:
+                spoken_zip = " ".join(f"{zip_code:05d}")
+                try:
+                    buoys = buoy_names(find_buoys_near(*centroid, radius))
+                    speak_output = f"I found the following buoys near {spoken_zip}. {', '.join(buoys)}"
+                except KeyError as e:
+                    speak_output = f"I could not find buoys near {spoken_zip}"
+            elif not Zip_Codes.available:
+                speak_output = "I am not able to search by zip code right now"
+            else:
+                speak_output = f"I could not find the zip code {zip_value}"
+
+        return (
+            handler_input.response_builder
+                .speak(speak_output)
+                # .ask("add a reprompt if you want to keep the session open for the user to respond")
+                .response
+        )
+
+
 class DataNearLocationIntentHandler(AbstractRequestHandler):
     """Handler to provide information about buoys that can be found close to a
     specific city/state location.
@@ -147,24 +524,25 @@ class DataNearLocationIntentHandler(AbstractRequestHandler):
 
     def handle(self, handler_input):
         # type: (HandlerInput) -> Response
-        city = handler_input.request_envelope.request.intent.slots["near_city"].value
-        state = handler_input.request_envelope.request.intent.slots["near_state"].value
+        with timed("slot_parsing"):
+            city = handler_input.request_envelope.request.intent.slots["near_city"].value
+            state = handler_input.request_envelope.request.intent.slots["near_state"].value
+            city_id = get_slot_id(handler_input.request_envelope.request.intent.slots["near_city"]) or city.lower()
+            state_id = get_slot_id(handler_input.request_envelope.request.intent.slots["near_state"]) or state.lower()
+            radius = get_radius(handler_input.request_envelope.request.intent.slots)
 
         speak_output = ""
         
         try:
-            buoys = Location_Breakdown[state.lower()][city.lower()]["buoys"]
-            averages = defaultdict(list)
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                find_buoy_data = {executor.submit(create_buoy_wrapper, buoy_id, BaseVariables): 
-                    buoy_id for buoy_id in buoys}
-                
-                for futr in as_completed(find_buoy_data):
-                    for key, value in futr.result().items():
-                        averages[key].append(float(value))
+            with timed("location_lookup"):
+                buoys = find_buoys(state_id, city_id, radius)
+            _, observations = collect_observations(buoys, BaseVariables)
+            with timed("aggregation"):
+                averages = reduce_observations(observations, BaseVariables)
+            with timed("speech_rendering"):
                 if averages:
                     speak_output = ", ".join(
-                        [f"the average {BaseVariables[key][0]} is {round(mean(value), 2)} {BaseVariables[key][1]}"
+                        [f"the average {BaseVariables[key][0]} is {round(value[0], 2)} {BaseVariables[key][1]}"
                          for key, value in averages.items()]
                     )
         except KeyError as e:
@@ -181,8 +559,107 @@ class DataNearLocationIntentHandler(AbstractRequestHandler):
         )
 
 
+class DataInStateIntentHandler(AbstractRequestHandler):
+    """Handler to provide the average information about all buoys in a state. The
+    averages are read from the rollup tree that is built and refreshed in the background
+    from the latest observations, so the intent requires USE_LATEST_OBS.
+    """
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return ask_utils.is_intent_name("DataInState")(handler_input)
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+        with timed("slot_parsing"):
+            state = handler_input.request_envelope.request.intent.slots["near_state"].value
+            state_id = get_slot_id(handler_input.request_envelope.request.intent.slots["near_state"]) or state.lower()
+
+        speak_output = ""
+
+        try:
+            with timed("aggregation"):
+                region = Location_Resolver.region(state_id)
+                # the averages of a state are only kept for the latest observations
+                tree = get_rollup_tree(Location_Breakdown) if UseLatestObservations else None
+                averages = tree.state(region) if tree is not None else None
+            with timed("speech_rendering"):
+                if not UseLatestObservations:
+                    speak_output = f"I am not able to find the conditions in {state} right now"
+                elif tree is None:
+                    speak_output = f"I am still gathering the conditions in {state}, please try again in a minute"
+                elif averages:
+                    speak_output = ", ".join(
+                        [f"the average {BaseVariables[key][0]} is {round(value, 2)} {BaseVariables[key][1]}"
+                         for key, value in averages.items()]
+                    )
+        except KeyError as e:
+            speak_output = f"I could not find buoys in {state}"
+
+        if not speak_output:
+            speak_output = f"I was unable to retrieve data for {state}"
+
+        return (
+            handler_input.response_builder
+                .speak(speak_output)
+                # .ask("add a reprompt if you want to keep the session open for the user to respond")
+                .response
+        )
+
+
+class RankNearLocationIntentHandler(AbstractRequestHandler):
+    """Handler to rank the buoys close to a specific city/state location by a
+    single variable (ex. biggest waves or warmest water).
+    """
+    def can_handle(self, handler_input):
+        # type: (HandlerInput) -> bool
+        return ask_utils.is_intent_name("RankNearLocation")(handler_input)
+
+    def handle(self, handler_input):
+        # type: (HandlerInput) -> Response
+        with timed("slot_parsing"):
+            buoy_var = handler_input.request_envelope.request.intent.slots["buoy_var"].value
+            city = handler_input.request_envelope.request.intent.slots["near_city"].value
+            state = handler_input.request_envelope.request.intent.slots["near_state"].value
+            city_id = get_slot_id(handler_input.request_envelope.request.intent.slots["near_city"]) or city.lower()
+            state_id = get_slot_id(handler_input.request_envelope.request.intent.slots["near_state"]) or state.lower()
+            radius = get_radius(handler_input.request_envelope.request.intent.slots)
+            short_var = get_slot_id(handler_input.request_envelope.request.intent.slots["buoy_var"]) or find_buoy_variable(buoy_var)
+
+        speak_output = ""
+
+        if short_var is not None and short_var in TotalBuoyVariables:
+            lookup = {short_var: TotalBuoyVariables[short_var]}
+            try:
+                with timed("location_lookup"):
+                    buoys = find_buoys(state_id, city_id, radius)
+                stations, observations = collect_observations(buoys, lookup)
+                with timed("aggregation"):
+                    ranked = rank_observations(stations, observations, short_var, RankedBuoys)
+                with timed("speech_rendering"):
+                    if ranked:
+                        speak_output = f"The highest {lookup[short_var][0]} near {city} {state} is " + ", then ".join(
+                            [f"{round(value, 2)} {lookup[short_var][1]} at buoy {' '.join(station)}"
+                             for station, value in ranked]
+                        )
+            except KeyError as e:
+                speak_output = f"I could not find buoys in {city} {state}"
+
+        if not speak_output:
+            speak_output = f"I was not able to find {buoy_var} near {city} {state}"
+
+        return (
+            handler_input.response_builder
+                .speak(speak_output)
+                # .ask("add a reprompt if you want to keep the session open for the user to respond")
+                .response
+        )
+
+
 class SpecificBuoyDataIntentHandler(AbstractRequestHandler):
-    """Handler to provide a single value (if the buoy records that variable).
+    """Handler to provide the values of one or more variables (if the buoy records them).
+    The buoy is retrieved once for all of the variables. Follow-up questions without a buoy
+    (ex. `what about the wind speed`) are about the last buoy of the session, and the
+    observations retrieved earlier in the session are reused.
     """
 
     def can_handle(self, handler_input):
@@ -191,21 +668,42 @@ class SpecificBuoyDataIntentHandler(AbstractRequestHandler):
 
     def handle(self, handler_input):
         # type: (HandlerInput) -> Response
-        buoy_var = handler_input.request_envelope.request.intent.slots["buoy_var"].value
-        buoy_id = handler_input.request_envelope.request.intent.slots["buoy_id"].value
+        with timed("slot_parsing"):
+            buoy_var = " and ".join(x for x, _ in get_slot_values(handler_input.request_envelope.request.intent.slots["buoy_var"]))
+            buoy_slot = handler_input.request_envelope.request.intent.slots.get("buoy_id")
+            buoy_id = buoy_slot.value if buoy_slot is not None else None
+            station = get_slot_id(buoy_slot) or buoy_id
+            variables = get_slot_variables(handler_input.request_envelope.request.intent.slots["buoy_var"])
+            if not station:
+                # follow-up question about the last buoy of the session
+                station = SessionObservations(handler_input.attributes_manager.session_attributes).latest
+                buoy_id = buoy_names([station])[0] if station else None
 
         speak_output = ""
 
-        short_var = find_buoy_variable(buoy_var)
-        if short_var is not None:
-            if short_var in TotalBuoyVariables:
-                lookup = {short_var: TotalBuoyVariables[short_var]}
-                pulled_data = create_buoy_wrapper(buoy_id, lookup)
-                if pulled_data:
-                    speak_output = ", ".join(
-                        [f"{lookup[key][0]} is {value} {lookup[key][1]}"
-                         for key, value in pulled_data.items()]
-                    )
+        if not station:
+            speak_output = "Which buoy would you like to know about?"
+        else:
+            with timed("location_lookup"):
+                station, suggestions = resolve_station(station)
+            if station is None:
+                speak_output = unknown_buoy_speech(buoy_id, suggestions)
+
+        if station and variables:
+            lookup = {key: TotalBuoyVariables[key] for key in variables}
+            # the variables of a report are read from the same file, keep them for the next question
+            variable_dict = report_variables()
+            if not all(key in variable_dict for key in lookup):
+                variable_dict = lookup
+            pulled_data = get_session_buoy_data(handler_input, station, variable_dict)
+            with timed("speech_rendering"):
+                speak_output = ", ".join(
+                    [f"{lookup[key][0]} is {pulled_data[key]} {lookup[key][1]}"
+                     for key in variables if key in pulled_data]
+                )
+                missing = [lookup[key][0] for key in variables if key not in pulled_data]
+                if speak_output and missing:
+                    speak_output += f". I was not able to find {' or '.join(missing)} for {buoy_id}"
 
         if not speak_output:
             speak_output = f"I was not able to find {buoy_var} for {buoy_id}"
@@ -213,7 +711,7 @@ class SpecificBuoyDataIntentHandler(AbstractRequestHandler):
         return (
             handler_input.response_builder
             .speak(speak_output)
-            # .ask("add a reprompt if you want to keep the session open for the user to respond")
+            .ask(FollowUpPrompt)
             .response
         )
 
@@ -308,6 +806,26 @@ class IntentReflectorHandler(AbstractRequestHandler):
         )
 
 
+class MetricsRequestInterceptor(AbstractRequestInterceptor):
+    """Start recording the timings of the phases of the invocation."""
+    def process(self, handler_input):
+        # type: (HandlerInput) -> None
+        request = handler_input.request_envelope.request
+        name = request.object_type
+        if ask_utils.is_request_type("IntentRequest")(handler_input):
+            name = ask_utils.get_intent_name(handler_input)
+        start_invocation(request.request_id, name)
+
+
+class MetricsResponseInterceptor(AbstractResponseInterceptor):
+    """Write the timings of the invocation as a single structured record
+    (CloudWatch Embedded Metric Format) to the log.
+    """
+    def process(self, handler_input, response):
+        # type: (HandlerInput, Response) -> None
+        finish_invocation()
+
+
 class CatchAllExceptionHandler(AbstractExceptionHandler):
     """Generic error handling to capture any syntax or routing errors. If you receive an error
     stating the request handler chain is not found, you have not implemented a handler for
@@ -320,13 +838,13 @@ class CatchAllExceptionHandler(AbstractExceptionHandler):
     def handle(self, handler_input, exception):
         # type: (HandlerInput, Exception) -> Response
         logger.error(exception, exc_info=True)
-
-        speak_output = "Sorry, I had trouble doing what you asked. Please try again."
+        # response interceptors are not run when the request fails
+        finish_invocation(Error=True)
 
         return (
             handler_input.response_builder
-                .speak(speak_output)
-                .ask(speak_output)
+                .speak(ErrorSpeech)
+                .ask(ErrorSpeech)
                 .response
         )
 
@@ -338,7 +856,10 @@ sb = SkillBuilder()
 sb.add_request_handler(LaunchRequestHandler())
 sb.add_request_handler(BuoyIntentHandler())
 sb.add_request_handler(BuoysNearLocationIntentHandler())
+sb.add_request_handler(BuoysNearZipCodeIntentHandler())
 sb.add_request_handler(DataNearLocationIntentHandler())
+sb.add_request_handler(DataInStateIntentHandler())
+sb.add_request_handler(RankNearLocationIntentHandler())
 sb.add_request_handler(SpecificBuoyDataIntentHandler())
 sb.add_request_handler(HelpIntentHandler())
 sb.add_request_handler(CancelOrStopIntentHandler())
@@ -348,4 +869,31 @@ sb.add_request_handler(IntentReflectorHandler())
 
 sb.add_exception_handler(CatchAllExceptionHandler())
 
-lambda_handler = sb.lambda_handler()
+sb.add_global_request_interceptor(MetricsRequestInterceptor())
+sb.add_global_response_interceptor(MetricsResponseInterceptor())
+
+# A fraction of the invocations are profiled when PROFILE_SAMPLE_RATE is set, otherwise
+# the skill handler is used as is
+lambda_handler = profile_handler(sb.lambda_handler())
+
+
+def _warm_caches():
+    """Create the station cache and, when enabled, load the latest observations and start
+    building the rollups
+    """
+    station_cache.load()
+    if UseLatestObservations:
+        get_observation_table()
+        get_rollup_tree(Location_Breakdown)
+
+
+# Work that is done during the lambda init phase (INIT_STRATEGY=eager), on a background
+# thread started during the init phase (background) or by the first request (lazy).
+InitSteps = [
+    ("location index", lambda: Location_Breakdown.preload()),
+    ("variable lookups", lambda: find_buoy_variable("wave height")),
+    ("buoy modules", lambda: [x.load() for x in (create_buoy, read_latest_realtime, get_observation_table, SessionObservations)]),
+    ("http opener", get_opener),
+    ("caches", _warm_caches),
+]
+init_thread = initialize(InitSteps)
@@ -0,0 +1,107 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from importlib import import_module
+from threading import Lock
+
+
+class LazyObject:
+    """Proxy for an object that is expensive to create or import. The object is created
+    the first time that the proxy is used (attribute access, call, item lookup, ...)
+    and every use afterwards is forwarded to the object.
+    """
+
+    __slots__ = ("_factory", "_object", "_lock")
+
+    def __init__(self, factory):
+        """
+        :param factory: function (no arguments) that creates the object
+        """
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_object", None)
+        object.__setattr__(self, "_lock", Lock())
+
+    @property
+    def loaded(self):
+        """True when the object has been created"""
+        return self._factory is None
+
+    def load(self):
+        """Create the object now instead of on first use.
+
+        :return: the object
+        """
+        return self._resolve()
+
+    def _resolve(self):
+        """Create the object (once) and return it"""
+        if self._factory is not None:
+            with self._lock:
+                if self._factory is not None:
+                    object.__setattr__(self, "_object", self._factory())
+                    object.__setattr__(self, "_factory", None)
+        return self._object
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getitem__(self, key):
+        return self._resolve()[key]
+
+    def __contains__(self, item):
+        return item in self._resolve()
+
+    def __iter__(self):
+        return iter(self._resolve())
+
+    def __len__(self):
+        return len(self._resolve())
+
+    def __enter__(self):
+        return self._resolve().__enter__()
+
+    def __exit__(self, *args):
+        return self._resolve().__exit__(*args)
+
+    def __repr__(self):
+        if self.loaded:
+            return repr(self._object)
+        return f"<{self.__class__.__name__} (not loaded)>"
+
+
+def lazy_import(module_name, attribute=None):
+    """Import a module, or an attribute of a module, the first time it is used.
+
+    :param module_name: name of the module (ex. "nautical.io")
+    :param attribute: name of the attribute in the module (ex. "create_buoy"). When None
+    the module is returned.
+    :return: LazyObject
+    """
+    if attribute is None:
+        return LazyObject(lambda: import_module(module_name))
+    return LazyObject(lambda: getattr(import_module(module_name), attribute))
@@ -0,0 +1,283 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from json import dumps
+from os import environ
+from threading import Lock, local
+from time import perf_counter, time
+
+
+# CloudWatch namespace of the metrics emitted for each invocation
+MetricsNamespace = environ.get("METRICS_NAMESPACE", "AlexaBuoys")
+
+# Set to false to stop writing the metrics record for each invocation
+MetricsEnabled = environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+# Upper bound (milliseconds) of each bucket of the fetch latency histograms. The
+# last bucket contains every fetch slower than the last bound.
+LatencyBuckets = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Outcomes of a fetch: data was found, the station had no data, the request failed
+# or the request timed out
+FetchOutcomes = ("ok", "empty", "error", "timeout")
+
+
+class LatencyHistogram:
+    """Fixed bucket histogram of the latency, payload size and outcome of fetches."""
+
+    __slots__ = ("buckets", "count", "total_ms", "max_ms", "bytes", "outcomes")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LatencyBuckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.bytes = 0
+        self.outcomes = dict.fromkeys(FetchOutcomes, 0)
+
+    def add(self, latency_ms, size=0, outcome="ok"):
+        """Add a single fetch to the histogram.
+
+        :param latency_ms: duration of the fetch in milliseconds
+        :param size: number of bytes received
+        :param outcome: one of FetchOutcomes
+        """
+        self.buckets[bisect_left(LatencyBuckets, latency_ms)] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        self.bytes += size
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def to_dict(self):
+        """Convert the histogram to a dictionary, empty buckets are not included"""
+        labels = [f"le_{x}" for x in LatencyBuckets] + ["inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "bytes": self.bytes,
+            "buckets": {label: n for label, n in zip(labels, self.buckets) if n},
+            "outcomes": {key: n for key, n in self.outcomes.items() if n},
+        }
+
+
+class FetchHistograms:
+    """Latency histograms of the outbound fetches grouped by station and by host."""
+
+    def __init__(self):
+        self.stations = {}
+        self.hosts = {}
+        self._lock = Lock()
+
+    def add(self, station, host, latency_ms, size=0, outcome="ok"):
+        """Add a single fetch to the histograms of the station and the host.
+
+        :param station: ID of the buoy (station)
+        :param host: host that was contacted
+        :param latency_ms: duration of the fetch in milliseconds
+        :param size: number of bytes received
+        :param outcome: one of FetchOutcomes
+        """
+        with self._lock:
+            for group, key in ((self.stations, str(station).upper()), (self.hosts, host)):
+                if key not in group:
+                    group[key] = LatencyHistogram()
+                group[key].add(latency_ms, size, outcome)
+
+    def __len__(self):
+        return len(self.stations)
+
+    def to_dict(self):
+        """Convert the histograms to a dictionary"""
+        with self._lock:
+            return {
+                "hosts": {key: value.to_dict() for key, value in self.hosts.items()},
+                "stations": {key: value.to_dict() for key, value in self.stations.items()},
+            }
+
+
+# Histograms of every fetch made by the container (kept in memory between invocations)
+# and of the fetches made since the last invocation finished.
+container_fetches = FetchHistograms()
+_pending_fetches = FetchHistograms()
+
+# Histograms that the fetches of a thread are recorded in (see bind_fetches)
+_bound = local()
+
+
+def bind_fetches(function):
+    """Wrap a function so that the fetches it records are added to the histograms of the
+    invocation that is running now, even when the function runs in another thread and
+    finishes after the invocation (ex. a buoy that missed the deadline).
+
+    :param function: function that records fetches (ex. create_buoy_wrapper)
+    :return: the wrapped function
+    """
+    fetches = _pending_fetches
+
+    def bound(*args, **kwargs):
+        previous = getattr(_bound, "fetches", None)
+        _bound.fetches = fetches
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _bound.fetches = previous
+
+    return bound
+
+
+def record_fetch(station, host, latency_ms, size=0, outcome="ok"):
+    """Record an outbound fetch for a station. The fetch is added to the histograms bound
+    to the thread (bind_fetches), otherwise to the histograms of the current invocation.
+
+    :param station: ID of the buoy (station)
+    :param host: host that was contacted
+    :param latency_ms: duration of the fetch in milliseconds
+    :param size: number of bytes received
+    :param outcome: one of FetchOutcomes
+    """
+    fetches = getattr(_bound, "fetches", None)
+    container_fetches.add(station, host, latency_ms, size, outcome)
+    (_pending_fetches if fetches is None else fetches).add(station, host, latency_ms, size, outcome)
+
+
+class InvocationMetrics:
+    """Timings (milliseconds) of the phases of a single invocation. A phase can be
+    recorded many times (ex. one buoy fetch per station) from any thread.
+    """
+
+    def __init__(self, request_id=None, name=None):
+        """
+        :param request_id: ID of the Alexa request
+        :param name: name of the intent or request type
+        """
+        self.request_id = request_id
+        self.name = name
+        self.started = perf_counter()
+        self.timestamp = int(time() * 1000)
+        self.phases = {}
+        self.properties = {}
+        self._lock = Lock()
+
+    def record(self, phase, duration_ms):
+        """Record the duration of a phase.
+
+        :param phase: name of the phase
+        :param duration_ms: duration in milliseconds
+        """
+        with self._lock:
+            self.phases.setdefault(phase, []).append(round(duration_ms, 3))
+
+    def to_emf(self, namespace=None):
+        """Create the CloudWatch Embedded Metric Format record for the invocation.
+        Phases recorded more than once are written as a list of values.
+
+        :param namespace: CloudWatch namespace (default METRICS_NAMESPACE)
+        :return: dictionary of the record
+        """
+        with self._lock:
+            phases = {key: value[0] if len(value) == 1 else list(value) for key, value in self.phases.items()}
+
+        record = {
+            "_aws": {
+                "Timestamp": self.timestamp,
+                "CloudWatchMetrics": [{
+                    "Namespace": namespace or MetricsNamespace,
+                    "Dimensions": [["Intent"]],
+                    "Metrics": [{"Name": name, "Unit": "Milliseconds"} for name in phases],
+                }],
+            },
+            "Intent": self.name,
+            "RequestId": self.request_id,
+        }
+        record.update(self.properties)
+        record.update(phases)
+        return record
+
+
+# Lambda handles one invocation at a time per container, the metrics of the current
+# invocation are shared by every thread (ex. the buoy fetch thread pool).
+_current = None
+
+
+def start_invocation(request_id=None, name=None):
+    """Start recording the metrics for a new invocation.
+
+    :param request_id: ID of the Alexa request
+    :param name: name of the intent or request type
+    :return: InvocationMetrics
+    """
+    global _current
+    _current = InvocationMetrics(request_id, name)
+    return _current
+
+
+def current_invocation():
+    """Get the metrics of the current invocation, None when no invocation was started"""
+    return _current
+
+
+def finish_invocation(**properties):
+    """Stop recording the current invocation and write the metrics record to stdout.
+    CloudWatch extracts the metrics from the record in the lambda log.
+
+    :param properties: additional properties written to the record (ex. error=True)
+    :return: the record (dictionary), None when no invocation was started
+    """
+    global _current, _pending_fetches
+
+    invocation, _current = _current, None
+    if invocation is None:
+        return None
+
+    invocation.record("dispatch", (perf_counter() - invocation.started) * 1000)
+    invocation.properties.update(properties)
+
+    # the fetches of the invocation are written in aggregate (histograms)
+    fetches, _pending_fetches = _pending_fetches, FetchHistograms()
+    if len(fetches):
+        invocation.properties["Fetches"] = fetches.to_dict()
+
+    record = invocation.to_emf()
+    if MetricsEnabled:
+        print(dumps(record), flush=True)
+    return record
+
+
+@contextmanager
+def timed(phase):
+    """Record the duration of the block as a phase of the current invocation. Nothing
+    is recorded when no invocation was started.
+
+    :param phase: name of the phase
+    """
+    invocation = _current
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        if invocation is not None:
+            invocation.record(phase, (perf_counter() - start) * 1000)
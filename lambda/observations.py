@@ -0,0 +1,430 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging
+from calendar import timegm
+from heapq import nlargest
+from os import environ
+from threading import Lock
+from time import time
+from urllib.error import URLError
+import numpy as np
+from buoy_lookup import TotalBuoyVariables
+from connections import open_url
+
+
+logger = logging.getLogger(__name__)
+
+# NDBC publishes the most recent observation of every station in a single file.
+LatestObservationsUrl = "https://www.ndbc.noaa.gov/data/latest_obs/latest_obs.txt"
+
+# Set to a local path (fixture) to read the latest observations from disk instead of NDBC
+LatestObservationsFile = environ.get("LATEST_OBS_FILE")
+
+# Seconds to wait for NDBC before giving up on the download of the latest observations
+LatestObservationsTimeout = float(environ.get("NDBC_TIMEOUT", 5.0))
+
+# Number of seconds before the latest observations are downloaded again
+LatestObservationsMaxAge = float(environ.get("LATEST_OBS_MAX_AGE", 300.0))
+
+# Number of seconds that the data retrieved for a single station is reused
+StationCacheMaxAge = float(environ.get("STATION_CACHE_MAX_AGE", 300.0))
+
+# NDBC value for missing data
+MissingData = "MM"
+
+# The latest observation file reports metric units, nautical (and the skill) use the
+# values shown on the station page. Map of the nautical.Buoy variable to the latest
+# observation column and the conversion to apply to that column.
+LatestObservationColumns = {
+    "wspd": ["WSPD", lambda x: x * 1.943844],
+    "gst": ["GST", lambda x: x * 1.943844],
+    "wvht": ["WVHT", lambda x: x * 3.28084],
+    "dpd": ["DPD", lambda x: x],
+    "apd": ["APD", lambda x: x],
+    "pres": ["PRES", lambda x: x * 0.02953],
+    "atmp": ["ATMP", lambda x: x * 9.0 / 5.0 + 32.0],
+    "wtmp": ["WTMP", lambda x: x * 9.0 / 5.0 + 32.0],
+    "dewp": ["DEWP", lambda x: x * 9.0 / 5.0 + 32.0],
+    "vis": ["VIS", lambda x: x],
+    "tide": ["TIDE", lambda x: x],
+}
+
+
+# Columns (year, month, day, hour, minute) of the UTC time of an observation. The year
+# column is YY in the realtime2 files and YYYY in the latest observation file.
+ObservationTimeColumns = [("YY", "YYYY"), ("MM",), ("DD",), ("hh",), ("mm",)]
+
+
+# Structured array type used to store observations, one float32 field per variable
+ObservationType = np.dtype([(key, np.float32) for key in TotalBuoyVariables])
+
+
+class ObservationTable:
+    """Columnar, in memory table of the latest observation for each station. The
+    observations are stored in a structured array where each station is a row (index)
+    and each variable in TotalBuoyVariables is a field. Values that were not reported
+    are stored as NaN.
+    """
+
+    def __init__(self, stations, data, created=None, observed=None):
+        """
+        :param stations: list of station IDs, the position is the row index of the station
+        :param data: structured array (ObservationType) with one row per station
+        :param created: epoch time that the table was created
+        :param observed: array of the epoch time of the observation of each station (NaN
+        when unknown)
+        """
+        self.stations = stations
+        self.index = {station: i for i, station in enumerate(stations)}
+        self.data = data
+        self.observed = np.full(len(stations), np.nan) if observed is None else observed
+        self.created = time() if created is None else created
+        self._indices = {}
+
+    def __len__(self):
+        return len(self.stations)
+
+    def __contains__(self, station):
+        return str(station).upper() in self.index
+
+    @property
+    def age(self):
+        """Number of seconds since the table was created"""
+        return time() - self.created
+
+    def indices(self, stations):
+        """Get the row indices for a group of stations (ex. all buoys near a city).
+        The index arrays are cached for the life of the table.
+
+        :param stations: list of station IDs
+        :return: array of row indices for the stations found in the table
+        """
+        key = tuple(stations)
+        if key not in self._indices:
+            self._indices[key] = np.array(
+                [self.index[x] for x in (str(y).upper() for y in stations) if x in self.index],
+                dtype=np.intp
+            )
+        return self._indices[key]
+
+    def take(self, stations, variable_dict=None):
+        """Get the observations for a group of stations.
+
+        :param stations: list of station IDs
+        :param variable_dict: dictionary of the requested variables, a station that did not
+        report (NaN) one of the variables is returned as missing
+        :return: tuple of the list of stations found in the table, the structured array
+        of rows for those stations and the list of stations that were not found
+        """
+        in_table = [x for x in stations if x in self]
+        rows = self.data[self.indices(stations)]
+        keys = [key for key in variable_dict or [] if key in ObservationType.names]
+        if keys:
+            complete = ~np.isnan(np.column_stack([rows[key] for key in keys])).any(axis=1)
+            rows = rows[complete]
+            in_table = [x for x, reported in zip(in_table, complete) if reported]
+
+        found = set(in_table)
+        return in_table, rows, [x for x in stations if x not in found]
+
+    def observed_time(self, station):
+        """Get the time of the observation of a single station.
+
+        :param station: ID of the buoy (station)
+        :return: epoch time (UTC) of the observation, None when the station is not in the
+        table or the time was not reported
+        """
+        row = self.index.get(str(station).upper())
+        if row is None or np.isnan(self.observed[row]):
+            return None
+        return int(self.observed[row])
+
+    def get(self, station, variable_dict=None):
+        """Get the observation for a single station.
+
+        :param station: ID of the buoy (station)
+        :param variable_dict: dictionary where the keys control what variables are returned
+
+        :return: dictionary of the reported values for the station, empty when the station
+        is not in the table
+        """
+        if variable_dict is None:
+            variable_dict = TotalBuoyVariables
+
+        row = self.index.get(str(station).upper())
+        if row is None:
+            return {}
+
+        observation = self.data[row]
+        pulled_data = {}
+        for key in variable_dict:
+            if key in ObservationType.names and not np.isnan(observation[key]):
+                pulled_data[key] = round(float(observation[key]), 2)
+        return pulled_data
+
+
+def to_observation_array(observations):
+    """Convert buoy data dictionaries (ex. the output of create_buoy_wrapper) to
+    a structured array. Values that are missing or cannot be converted are NaN.
+
+    :param observations: list of dictionaries of variable name to value
+    :return: structured array (ObservationType) with one row per dictionary
+    """
+    data = np.full(len(observations), np.nan, dtype=ObservationType)
+    for row, observation in enumerate(observations):
+        for key, value in observation.items():
+            if key in ObservationType.names:
+                data[key][row] = _parse_value(str(value), float)
+    return data
+
+
+def stack_observations(arrays):
+    """Join multiple structured arrays (ObservationType) into a single array.
+
+    :param arrays: list of structured arrays
+    :return: structured array containing the rows of every array
+    """
+    if not arrays:
+        return np.empty(0, dtype=ObservationType)
+    return np.concatenate(arrays)
+
+
+def reduce_observations(data, variable_dict=None):
+    """Find the mean, min and max of each variable over the rows of observations.
+    Missing (NaN) values are ignored.
+
+    :param data: structured array (ObservationType)
+    :param variable_dict: dictionary where the keys control what variables are reduced
+
+    :return: dictionary of variable name to a tuple of (mean, min, max). Variables that
+    were not reported by any row are not included.
+    """
+    if variable_dict is None:
+        variable_dict = TotalBuoyVariables
+
+    reduced = {}
+    for key in variable_dict:
+        if key not in ObservationType.names:
+            continue
+        values = data[key]
+        values = values[~np.isnan(values)]
+        if values.size:
+            reduced[key] = (float(values.mean()), float(values.min()), float(values.max()))
+    return reduced
+
+
+def rank_observations(stations, data, key, k=3):
+    """Find the stations with the largest values of a variable. A bounded heap is
+    used so the full list of values is never sorted.
+
+    :param stations: list of station IDs, one per row of data
+    :param data: structured array (ObservationType)
+    :param key: name of the variable to rank
+    :param k: number of stations to return
+
+    :return: list of (station, value) tuples, largest value first. Stations that did
+    not report the variable are not included.
+    """
+    values = data[key]
+    return [
+        (station, float(value)) for value, station in nlargest(
+            k, ((value, stations[i]) for i, value in enumerate(values) if not np.isnan(value))
+        )
+    ]
+
+
+def _parse_value(value, conversion):
+    """Convert a single observation value, NaN when the value is missing."""
+    if value == MissingData:
+        return np.nan
+    try:
+        return conversion(float(value))
+    except ValueError:
+        return np.nan
+
+
+def parse_observation_time(row, header):
+    """Get the time of a row of an NDBC observation file.
+
+    :param row: list of the values in the row
+    :param header: dictionary of the column name to the position in the row
+    :return: epoch time (UTC) of the observation, None when the time columns are missing
+    or cannot be converted
+    """
+    fields = []
+    for names in ObservationTimeColumns:
+        column = next((header[name] for name in names if name in header), None)
+        if column is None:
+            return None
+        fields.append(row[column])
+
+    try:
+        year, month, day, hour, minute = (int(x) for x in fields)
+        return timegm((year, month, day, hour, minute, 0))
+    except ValueError:
+        return None
+
+
+def parse_latest_observations(lines):
+    """Parse the contents of the NDBC latest observation file.
+
+    :param lines: iterable of the lines (str) in the file. The first line must be the header.
+    :return: ObservationTable containing all stations in the file
+    """
+    stations = []
+    rows = []
+    observed = []
+    header = None
+
+    for line in lines:
+        if line.startswith("#"):
+            # The first comment line is the header, the second contains the units
+            if header is None:
+                header = {name: i for i, name in enumerate(line.lstrip("#").split())}
+            continue
+
+        row = line.split()
+        if header is None or len(row) < len(header):
+            continue
+
+        stations.append(row[0].upper())
+        observed_time = parse_observation_time(row, header)
+        observed.append(np.nan if observed_time is None else observed_time)
+        values = []
+        for key in ObservationType.names:
+            value = np.nan
+            if key in LatestObservationColumns:
+                name, conversion = LatestObservationColumns[key]
+                if name in header:
+                    value = _parse_value(row[header[name]], conversion)
+            values.append(value)
+        rows.append(tuple(values))
+
+    return ObservationTable(
+        stations, np.array(rows, dtype=ObservationType), observed=np.array(observed, dtype=np.float64)
+    )
+
+
+def load_latest_observations(source=None):
+    """Load the latest observations from a local file or the NDBC website.
+
+    :param source: path to a local file. When None, the LATEST_OBS_FILE environment
+    variable is used, and when that is not set the file is downloaded from NDBC.
+    :return: ObservationTable
+    """
+    source = source or LatestObservationsFile
+    if source:
+        with open(source, "r") as obsfile:
+            return parse_latest_observations(obsfile)
+
+    with open_url(LatestObservationsUrl, timeout=LatestObservationsTimeout) as response:
+        lines = response.read().decode("utf-8", errors="replace").splitlines()
+    return parse_latest_observations(lines)
+
+
+class StationCache:
+    """Cache of the data retrieved for individual stations (ex. create_buoy_wrapper)
+    so that repeated and overlapping requests do not fetch the same station again.
+    """
+
+    def __init__(self, max_age=None):
+        """
+        :param max_age: number of seconds an entry is valid (default STATION_CACHE_MAX_AGE)
+        """
+        self.max_age = StationCacheMaxAge if max_age is None else max_age
+        self._entries = {}
+        self._lock = Lock()
+
+    def get(self, station, variable_dict):
+        """Get the cached data for a station.
+
+        :param station: ID of the buoy (station)
+        :param variable_dict: dictionary where the keys control what variables are returned
+        :return: dictionary of the cached data or None when the entry does not exist,
+        is too old or was not retrieved with all the requested variables
+        """
+        with self._lock:
+            entry = self._entries.get(str(station).upper())
+        if entry is None or time() - entry[0] > self.max_age or not entry[1].issuperset(variable_dict):
+            return None
+        return {key: value for key, value in entry[2].items() if key in variable_dict}
+
+    def observed_time(self, station):
+        """Get the time of the observation cached for a station.
+
+        :param station: ID of the buoy (station)
+        :return: epoch time (UTC) of the observation, None when the station is not cached
+        or the observation time is unknown (station page)
+        """
+        with self._lock:
+            entry = self._entries.get(str(station).upper())
+        return None if entry is None else entry[3]
+
+    def put(self, station, variable_dict, data, observed=None):
+        """Save the data retrieved for a station.
+
+        :param station: ID of the buoy (station)
+        :param variable_dict: dictionary of the variables that were requested
+        :param data: dictionary of the data that was retrieved
+        :param observed: epoch time (UTC) of the observation, None when unknown
+        """
+        with self._lock:
+            self._entries[str(station).upper()] = (time(), set(variable_dict), data, observed)
+
+
+_table = None
+_last_attempt = 0.0
+_table_lock = Lock()
+
+
+def get_observation_table(max_age=None):
+    """Get the cached observation table. The table is (re)loaded when it does not
+    exist or it is older than `max_age` seconds. A failed load is not retried until
+    `max_age` seconds have passed so that requests are not stalled by NDBC. Only one
+    request loads the table, the other requests use the current table in the meantime.
+
+    :param max_age: maximum age of the table in seconds (default LATEST_OBS_MAX_AGE)
+    :return: ObservationTable or None when no table could be loaded
+    """
+    global _table, _last_attempt
+
+    if max_age is None:
+        max_age = LatestObservationsMaxAge
+
+    with _table_lock:
+        table = _table
+        if time() - _last_attempt < max_age:
+            return table
+        _last_attempt = time()
+
+    # the download is not done while holding the lock
+    try:
+        table = load_latest_observations()
+        logger.info("Loaded latest observations for %d stations", len(table))
+    except (OSError, URLError, ValueError) as error:
+        logger.error("Failed to load the latest observations: %s", error)
+        return table
+
+    with _table_lock:
+        _table = table
+    return table
@@ -0,0 +1,189 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging
+import sys
+from collections import Counter
+from json import dumps
+from os import environ, path
+from random import random
+from threading import Event, Thread, get_ident
+from time import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_sample_rate(value):
+    """Parse the fraction of invocations that are profiled.
+
+    :param value: fraction as a ratio (`1/500`) or a float (`0.002`)
+    :return: sample rate between 0 and 1, 0 when the value is empty or invalid
+    """
+    if not value:
+        return 0.0
+    try:
+        if "/" in value:
+            numerator, denominator = value.split("/", 1)
+            rate = float(numerator) / float(denominator)
+        else:
+            rate = float(value)
+    except (ValueError, ZeroDivisionError):
+        logger.warning("Invalid profile sample rate %s, profiling is disabled", value)
+        return 0.0
+    return min(max(rate, 0.0), 1.0)
+
+
+# Fraction of the invocations that are profiled (ex. 1/500). Profiling is disabled
+# when the variable is not set.
+ProfileSampleRate = parse_sample_rate(environ.get("PROFILE_SAMPLE_RATE"))
+
+# Milliseconds between samples of the stacks of every thread
+ProfileInterval = float(environ.get("PROFILE_INTERVAL", 5.0))
+
+# Directory where the profiles are written, or `stdout` to write them to the log
+ProfileOutput = environ.get("PROFILE_OUTPUT", "/tmp")
+
+
+# Labels of the top (innermost) frame of a thread that is waiting instead of running. Threads
+# in these frames (ex. idle pool workers, the rollup refresh loop) are not sampled. Sleep and
+# SimpleQueue.get are implemented in C, so the top frame of a thread blocked in them is the
+# function that called them.
+IdleFrames = frozenset({
+    "threading:wait",
+    "threading:_wait_for_tstate_lock",
+    "queue:get",
+    "selectors:select",
+    "concurrent.futures.thread:_worker",
+    "rollups:_build_and_refresh",
+})
+
+
+def _frame_label(frame):
+    """Label of a stack frame in the collapsed stack (`module:function`)"""
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class StackSampler:
+    """Sampling profiler. A background thread records the stack of every other thread
+    that is not waiting (IdleFrames) every `interval` milliseconds. The samples are counted
+    per collapsed stack (root first, frames separated by `;`) which is the input format of
+    flamegraph tools.
+    """
+
+    def __init__(self, interval=None):
+        """
+        :param interval: milliseconds between samples (default PROFILE_INTERVAL)
+        """
+        self.interval = (ProfileInterval if interval is None else interval) / 1000.0
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = Event()
+        self._thread = None
+
+    def _sample(self):
+        """Record the current stack of every thread except the sampler and waiting threads"""
+        own = get_ident()
+        for ident, frame in sys._current_frames().items():  # pylint: disable=protected-access
+            if ident == own or _frame_label(frame) in IdleFrames:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        """Start sampling"""
+        self._stop.clear()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def collapsed(self):
+        """Get the profile in the collapsed stack format
+
+        :return: list of `stack count` lines, most frequent stack first
+        """
+        return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+
+def write_profile(sampler, name, output=None):
+    """Write the collapsed stacks of a profile.
+
+    :param sampler: StackSampler that was stopped
+    :param name: name of the profile (ex. the request ID)
+    :param output: directory for the profile or `stdout` (default PROFILE_OUTPUT)
+    :return: path of the profile, None when the profile was written to stdout
+    """
+    output = output or ProfileOutput
+    if output == "stdout":
+        print(dumps({"Profile": name, "Samples": sampler.samples, "Stacks": sampler.collapsed()}))
+        return None
+
+    filename = path.join(output, f"profile-{name}.folded")
+    with open(filename, "w") as profile:
+        profile.write("\n".join(sampler.collapsed()) + "\n")
+    logger.info("Wrote profile (%d samples) to %s", sampler.samples, filename)
+    return filename
+
+
+def profile_handler(handler, sample_rate=None):
+    """Wrap a lambda handler so that a fraction of the invocations are profiled.
+
+    :param handler: lambda handler function (event, context)
+    :param sample_rate: fraction of invocations to profile (default PROFILE_SAMPLE_RATE)
+    :return: the handler itself when profiling is disabled, otherwise the wrapped handler
+    """
+    sample_rate = ProfileSampleRate if sample_rate is None else sample_rate
+    if sample_rate <= 0.0:
+        return handler
+
+    def wrapper(event, context):
+        if random() >= sample_rate:
+            return handler(event, context)
+
+        name = getattr(context, "aws_request_id", None) or str(int(time() * 1000))
+        sampler = StackSampler().start()
+        try:
+            return handler(event, context)
+        finally:
+            sampler.stop()
+            try:
+                write_profile(sampler, name)
+            except OSError as error:
+                logger.error("Failed to write profile %s: %s", name, error)
+
+    return wrapper
@@ -0,0 +1,190 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging
+from os import environ
+from socket import timeout as SocketTimeout
+from urllib.error import URLError
+from urllib.parse import urlparse
+from urllib.request import Request
+from buoy_lookup import BaseVariables
+from connections import open_url
+from observations import LatestObservationColumns, MissingData, parse_observation_time
+
+
+logger = logging.getLogger(__name__)
+
+# Directory containing the realtime data (`<station>.txt`) for each station. The
+# newest observation is the first row after the two header lines.
+RealtimeUrl = environ.get("NDBC_REALTIME_URL", "https://www.ndbc.noaa.gov/data/realtime2")
+
+# Number of bytes requested from the start of the file when the server supports
+# HTTP Range requests. Rows are ~100 bytes, so this covers the header and a few hours.
+RealtimeRangeBytes = int(environ.get("NDBC_REALTIME_RANGE", 4096))
+
+# Maximum number of data rows searched for variables that are missing (MM) in the newest
+# row (waves are often reported less frequently than the meteorological data).
+RealtimeMaxRows = 12
+
+# Seconds to wait for NDBC before giving up on the station
+RealtimeTimeout = float(environ.get("NDBC_TIMEOUT", 5.0))
+
+# Host that serves the realtime2 files
+RealtimeHost = urlparse(RealtimeUrl).netloc
+
+
+def parse_realtime_lines(lines, variable_dict=None, max_rows=RealtimeMaxRows):
+    """Parse the newest observation from the lines of an NDBC realtime2 (standard
+    meteorological) file. Parsing stops as soon as every variable has been found
+    or `max_rows` data rows have been searched.
+
+    :param lines: iterable of the lines (str) in the file, newest row first
+    :param variable_dict: dictionary where the keys control what variables are returned
+    :param max_rows: maximum number of data rows to search
+
+    :return: dictionary of the variable to value (same units as nautical), empty when
+    no data was found
+    """
+    return parse_realtime_observation(lines, variable_dict, max_rows)[0]
+
+
+def parse_realtime_observation(lines, variable_dict=None, max_rows=RealtimeMaxRows):
+    """Parse the newest observation from the lines of an NDBC realtime2 file along with the
+    time of the observation (see parse_realtime_lines).
+
+    :param lines: iterable of the lines (str) in the file, newest row first
+    :param variable_dict: dictionary where the keys control what variables are returned
+    :param max_rows: maximum number of data rows to search
+
+    :return: tuple of the dictionary of the variable to value and the epoch time (UTC) of
+    the oldest row that a value was taken from (None when no data was found)
+    """
+    if variable_dict is None:
+        variable_dict = BaseVariables
+
+    wanted = {key: LatestObservationColumns[key] for key in variable_dict if key in LatestObservationColumns}
+    header = None
+    pulled_data = {}
+    observed = None
+    rows = 0
+
+    for line in lines:
+        if line.startswith("#"):
+            # The first comment line is the header, the second contains the units
+            if header is None:
+                header = {name: i for i, name in enumerate(line.lstrip("#").split())}
+            continue
+
+        row = line.split()
+        if header is None or len(row) < len(header):
+            # a partial read can end in the middle of a row
+            continue
+
+        found = len(pulled_data)
+        for key, (name, conversion) in wanted.items():
+            if key in pulled_data or name not in header or row[header[name]] == MissingData:
+                continue
+            try:
+                pulled_data[key] = round(conversion(float(row[header[name]])), 2)
+            except ValueError:
+                pass
+        if len(pulled_data) > found:
+            # rows are newest first, the oldest row used is the age of the observation
+            observed = parse_observation_time(row, header) or observed
+
+        rows += 1
+        if len(pulled_data) == len(wanted) or rows >= max_rows:
+            break
+
+    # keep the order of the variable dictionary
+    return {key: pulled_data[key] for key in wanted if key in pulled_data}, observed
+
+
+def _iter_response_lines(response, result, limit):
+    """Stream the decoded lines of a response, stopping once `limit` bytes were read.
+
+    :param response: open http response
+    :param result: RealtimeRead where the number of bytes read is recorded
+    :param limit: maximum number of bytes to read
+    """
+    while result.bytes_read < limit:
+        line = response.readline(limit - result.bytes_read)
+        if not line:
+            break
+        result.bytes_read += len(line)
+        yield line.decode("utf-8", errors="replace")
+
+
+class RealtimeRead:
+    """Result of a partial read of a realtime2 file."""
+
+    def __init__(self, station):
+        self.station = station
+        self.host = RealtimeHost
+        self.data = {}
+        self.observed = None
+        self.bytes_read = 0
+        self.status = None
+        self.partial = False
+        self.error = None
+
+    @property
+    def outcome(self):
+        """Outcome of the read (see metrics.FetchOutcomes)"""
+        if self.error is None:
+            return "ok" if self.data else "empty"
+        # urllib wraps the socket timeout in a URLError while connecting
+        reason = getattr(self.error, "reason", self.error)
+        return "timeout" if isinstance(reason, SocketTimeout) else "error"
+
+
+def read_latest_realtime(station, variable_dict=None):
+    """Read the newest observation for a station from the NDBC realtime2 directory.
+    Only the start of the file is requested (HTTP Range) and the response is streamed
+    until the newest values are found, the rest of the file is never read.
+
+    :param station: ID of the buoy (station)
+    :param variable_dict: dictionary where the keys control what variables are returned
+
+    :return: RealtimeRead, the data is empty when the station could not be read
+    """
+    result = RealtimeRead(str(station).upper())
+    request = Request(
+        f"{RealtimeUrl}/{result.station}.txt",
+        headers={"Range": f"bytes=0-{RealtimeRangeBytes - 1}"}
+    )
+
+    try:
+        with open_url(request, timeout=RealtimeTimeout) as response:
+            result.status = response.status
+            # 206 means the server honored the range, otherwise stop reading early
+            result.partial = response.status == 206
+            result.data, result.observed = parse_realtime_observation(
+                _iter_response_lines(response, result, RealtimeRangeBytes), variable_dict
+            )
+    except (OSError, URLError, ValueError) as error:
+        logger.warning("Failed to read realtime data for %s: %s", result.station, error)
+        result.error = error
+        # HTTPError (4xx/5xx) carries the status of the response
+        result.status = getattr(error, "code", result.status)
+
+    return result
@@ -0,0 +1,320 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from collections import defaultdict
+from heapq import nlargest
+
+
+# Words that are spoken or written in several ways, each word is replaced by the short form
+Abbreviations = {
+    "saint": "st",
+    "sainte": "ste",
+    "mount": "mt",
+    "fort": "ft",
+    "point": "pt",
+    "port": "pt",
+    "north": "n",
+    "south": "s",
+    "east": "e",
+    "west": "w",
+    "and": "&",
+}
+
+
+def normalize_name(name):
+    """Normalize a city or state name for the comparison of spoken and written names
+    (ex. `St. Augustine` and `saint augustine` are both `st augustine`).
+
+    :param name: name of the city or state
+    :return: lower case name without punctuation and with abbreviated words
+    """
+    cleaned = "".join(x if x.isalnum() or x == "&" else " " for x in str(name).lower())
+    return " ".join(Abbreviations.get(x, x) for x in cleaned.split())
+
+
+def trigrams(text):
+    """Set of the trigrams of the text, the text is padded so that the start and end of
+    the text are part of the trigrams.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Fuzzy lookup of names. The names are normalized (`normalize_name`) and each
+    trigram of a normalized name points to the names containing it. A query scores the
+    names that share a trigram with the query by the Dice coefficient of the trigram sets.
+    """
+
+    def __init__(self, names):
+        """
+        :param names: names (keys) that are returned by the lookups
+        """
+        self.names = []
+        self.exact = {}
+        self._sizes = []
+        self._postings = defaultdict(list)
+
+        for name in names:
+            normalized = normalize_name(name)
+            self.exact.setdefault(normalized, name)
+            grams = trigrams(normalized)
+            position = len(self.names)
+            self.names.append(name)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(position)
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, name, k=1):
+        """Find the names that are the most similar to a name.
+
+        :param name: spoken or written name
+        :param k: number of names
+        :return: list of (name, score) tuples, best first. The score is 1.0 for names that
+        are the same after normalization.
+        """
+        normalized = normalize_name(name)
+        if normalized in self.exact:
+            return [(self.exact[normalized], 1.0)]
+
+        grams = trigrams(normalized)
+        shared = defaultdict(int)
+        for gram in grams:
+            for position in self._postings.get(gram, ()):
+                shared[position] += 1
+
+        scored = nlargest(
+            k, ((2.0 * count / (len(grams) + self._sizes[position]), position)
+                for position, count in shared.items())
+        )
+        return [(self.names[position], score) for score, position in scored]
+
+    def best(self, name, threshold=0.0):
+        """Find the most similar name.
+
+        :param name: spoken or written name
+        :param threshold: minimum score of the match
+        :return: name, None when no name scores at least the threshold
+        """
+        found = self.search(name)
+        if found and found[0][1] >= threshold:
+            return found[0][0]
+        return None
+
+
+# Spoken digits and letters (NATO alphabet) in buoy IDs
+SpokenDigits = {
+    "zero": "0", "oh": "0", "one": "1", "two": "2", "to": "2", "too": "2", "three": "3",
+    "four": "4", "for": "4", "five": "5", "six": "6", "seven": "7", "eight": "8", "nine": "9",
+    "niner": "9",
+}
+SpokenTens = {
+    "ten": "1", "twenty": "2", "thirty": "3", "forty": "4", "fifty": "5", "sixty": "6", "seventy": "7",
+    "eighty": "8", "ninety": "9",
+}
+SpokenTeens = {
+    "eleven": "11", "twelve": "12", "thirteen": "13", "fourteen": "14", "fifteen": "15", "sixteen": "16",
+    "seventeen": "17", "eighteen": "18", "nineteen": "19",
+}
+SpokenLetters = {
+    "alpha": "A", "bravo": "B", "charlie": "C", "delta": "D", "echo": "E", "foxtrot": "F", "golf": "G",
+    "hotel": "H", "india": "I", "juliet": "J", "kilo": "K", "lima": "L", "mike": "M", "november": "N",
+    "oscar": "O", "papa": "P", "quebec": "Q", "romeo": "R", "sierra": "S", "tango": "T", "uniform": "U",
+    "victor": "V", "whiskey": "W", "xray": "X", "yankee": "Y", "zulu": "Z",
+}
+
+
+def normalize_buoy_id(value):
+    """Convert a spoken buoy ID to a station ID (ex. `four four zero two five`, `44 025`
+    and `forty four oh twenty five` are all `44025`).
+
+    :param value: slot value
+    :return: upper case station ID, empty when the value has no letters or digits
+    """
+    words = "".join(x if x.isalnum() else " " for x in str(value or "").lower()).split()
+    characters = []
+    for i, word in enumerate(words):
+        if word in SpokenTens:
+            # forty four is 44, forty is 40
+            following = words[i + 1] if i + 1 < len(words) else None
+            unit = SpokenDigits.get(following) if following not in (None, "oh", "zero") else None
+            characters.append(SpokenTens[word] + ("" if unit else "0"))
+        elif word in SpokenTeens:
+            characters.append(SpokenTeens[word])
+        elif word in SpokenDigits:
+            characters.append(SpokenDigits[word])
+        elif word in SpokenLetters:
+            characters.append(SpokenLetters[word])
+        else:
+            characters.append(word)
+    return "".join(characters).upper()
+
+
+class StationTrie:
+    """Trie of the station IDs. Used to check a station ID before it is requested from
+    NDBC and to suggest the stations that are a few edits away from an unknown ID.
+    """
+
+    _Station = ""
+
+    def __init__(self, stations):
+        """
+        :param stations: station IDs
+        """
+        self._root = {}
+        self._size = 0
+        for station in stations:
+            node = self._root
+            for character in station.upper():
+                node = node.setdefault(character, {})
+            if self._Station not in node:
+                self._size += 1
+            node[self._Station] = station.upper()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, station):
+        node = self._root
+        for character in str(station).upper():
+            node = node.get(character)
+            if node is None:
+                return False
+        return self._Station in node
+
+    def suggest(self, station, max_distance=1, k=3):
+        """Find the stations within an edit (Levenshtein) distance of a station ID.
+
+        :param station: station ID
+        :param max_distance: max number of edits
+        :param k: max number of stations
+        :return: list of (station, distance) tuples, closest first
+        """
+        station = str(station).upper()
+        found = []
+
+        def visit(node, previous):
+            for character, child in node.items():
+                if character == self._Station:
+                    continue
+                row = [previous[0] + 1]
+                for i, target in enumerate(station, start=1):
+                    row.append(min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + (target != character)))
+                if self._Station in child and row[-1] <= max_distance:
+                    found.append((child[self._Station], row[-1]))
+                if min(row) <= max_distance:
+                    visit(child, row)
+
+        def shared_prefix(candidate):
+            return next((i for i, (x, y) in enumerate(zip(candidate, station)) if x != y), min(len(candidate), len(station)))
+
+        visit(self._root, list(range(len(station) + 1)))
+        # the stations with the fewest edits, ties go to the stations that start the same way
+        return sorted(found, key=lambda x: (x[1], -shared_prefix(x[0]), x[0]))[:k]
+
+
+def levenshtein(first, second):
+    """Number of single character edits (insert, delete, replace) between two strings.
+    Bit-parallel algorithm (Myers, Hyyro), each column of the edit distance matrix is a
+    pair of bit vectors of the vertical differences so a character of the longer string
+    is a few integer operations.
+    """
+    if len(first) < len(second):
+        first, second = second, first
+    if not second:
+        return len(first)
+
+    matches = {}
+    for i, character in enumerate(second):
+        matches[character] = matches.get(character, 0) | (1 << i)
+
+    mask = (1 << len(second)) - 1
+    last = 1 << (len(second) - 1)
+    positive, negative, score = mask, 0, len(second)
+    for character in first:
+        equal = matches.get(character, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        horizontal_positive = negative | ~(horizontal | positive)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last:
+            score += 1
+        elif horizontal_negative & last:
+            score -= 1
+        horizontal_positive = (horizontal_positive << 1) | 1
+        horizontal_negative = horizontal_negative << 1
+        positive = (horizontal_negative | ~(vertical | horizontal_positive)) & mask
+        negative = horizontal_positive & vertical & mask
+    return score
+
+
+class BKTree:
+    """Burkhard-Keller tree of words for the search of the words within an edit distance.
+    Each child of a node is keyed by its distance to the node, so a search only visits the
+    children whose distance can be within the limit (triangle inequality).
+    """
+
+    def __init__(self, words):
+        """
+        :param words: words in the tree
+        """
+        self._root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        """Add a word to the tree"""
+        if self._root is None:
+            self._root = (word, {})
+            return
+
+        node = self._root
+        while True:
+            distance = levenshtein(word, node[0])
+            if distance == 0:
+                return
+            if distance not in node[1]:
+                node[1][distance] = (word, {})
+                return
+            node = node[1][distance]
+
+    def search(self, word, max_distance):
+        """Find the words within an edit distance of a word.
+
+        :param word: word to search for
+        :param max_distance: max number of edits
+        :return: list of (word, distance) tuples, closest first
+        """
+        found = []
+        candidates = [self._root] if self._root is not None else []
+        while candidates:
+            node_word, children = candidates.pop()
+            distance = levenshtein(word, node_word)
+            if distance <= max_distance:
+                found.append((node_word, distance))
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    candidates.append(child)
+        return sorted(found, key=lambda x: (x[1], x[0]))
@@ -0,0 +1,224 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging
+from collections import defaultdict
+from threading import Lock, Thread
+from time import sleep
+import numpy as np
+from buoy_lookup import BaseVariables
+from observations import LatestObservationsMaxAge, get_observation_table
+
+
+logger = logging.getLogger(__name__)
+
+
+class RollupNode:
+    """Running sum and count of the observations of every station below the node
+    (city or state) in the rollup tree.
+    """
+
+    __slots__ = ("sums", "counts")
+
+    def __init__(self, size):
+        self.sums = np.zeros(size, dtype=np.float64)
+        self.counts = np.zeros(size, dtype=np.int64)
+
+    def add(self, values, sign=1):
+        """Add (sign=1) or remove (sign=-1) the observation of a station.
+
+        :param values: array of the values of each variable, NaN when not reported
+        :param sign: 1 to add the values, -1 to remove them
+        """
+        reported = ~np.isnan(values)
+        self.sums[reported] += sign * values[reported]
+        self.counts[reported] += sign
+
+
+class RollupTree:
+    """Hierarchy of station -> city -> state where each city and state keeps a running
+    aggregate of the stations below it. When the observation of a station changes, only
+    the cities and states containing that station are updated.
+    """
+
+    def __init__(self, city_lookup, variable_dict=None):
+        """
+        :param city_lookup: dictionary of state -> city -> {"buoys": [station IDs]}
+        (ex. locations.Location_Breakdown)
+        :param variable_dict: dictionary where the keys control what variables are aggregated
+        """
+        if variable_dict is None:
+            variable_dict = BaseVariables
+
+        self.variables = list(variable_dict)
+        self.cities = {}
+        self.states = {}
+        self.observations = {}
+        self.created = None
+        self._parents = defaultdict(list)
+        self._lock = Lock()
+
+        for state, cities in city_lookup.items():
+            state_stations = set()
+            self.cities[state] = {}
+            for city, city_data in cities.items():
+                node = self.cities[state][city] = RollupNode(len(self.variables))
+                for station in city_data["buoys"]:
+                    self._parents[station.upper()].append(node)
+                    state_stations.add(station.upper())
+
+            # the state is aggregated over distinct stations, a station near several
+            # cities in the state is only counted once
+            node = self.states[state] = RollupNode(len(self.variables))
+            for station in state_stations:
+                self._parents[station].append(node)
+
+    @property
+    def stations(self):
+        """All stations in the tree"""
+        return list(self._parents)
+
+    def update(self, station, values):
+        """Set the observation for a station and update the cities and states above it.
+
+        :param station: ID of the buoy (station)
+        :param values: array of the values of each variable, NaN when not reported
+        :return: True when the observation changed
+        """
+        station = station.upper()
+        with self._lock:
+            previous = self.observations.get(station)
+            if previous is not None and np.array_equal(previous, values, equal_nan=True):
+                return False
+
+            for node in self._parents.get(station, []):
+                if previous is not None:
+                    node.add(previous, -1)
+                node.add(values)
+            self.observations[station] = values
+        return True
+
+    def refresh(self, table):
+        """Update the tree from an observation table. Only the stations that have a new
+        observation modify the aggregates. Stations missing from the table are removed.
+
+        :param table: observations.ObservationTable
+        :return: number of stations that changed
+        """
+        missing = np.full(len(self.variables), np.nan)
+        changed = 0
+        for station in self._parents:
+            values = missing
+            if station in table:
+                row = table.data[table.index[station]]
+                values = np.array([row[key] for key in self.variables], dtype=np.float64)
+            changed += self.update(station, values)
+
+        self.created = table.created
+        return changed
+
+    @staticmethod
+    def _averages(node, variables):
+        """Convert the aggregates of a node to a dictionary of variable -> average"""
+        return {
+            key: float(node.sums[i] / node.counts[i])
+            for i, key in enumerate(variables) if node.counts[i] > 0
+        }
+
+    def state(self, state):
+        """Get the average of each variable for all stations in the state.
+
+        :param state: name of the state (lower case)
+        :return: dictionary of variable -> average, raises KeyError when the state
+        does not exist
+        """
+        node = self.states[state]
+        with self._lock:
+            return self._averages(node, self.variables)
+
+    def city(self, state, city):
+        """Get the average of each variable for all stations near the city.
+
+        :param state: name of the state (lower case)
+        :param city: name of the city (lower case)
+        :return: dictionary of variable -> average, raises KeyError when the city
+        does not exist
+        """
+        node = self.cities[state][city]
+        with self._lock:
+            return self._averages(node, self.variables)
+
+
+_tree = None
+_tree_lock = Lock()
+_builder = None
+
+
+def _build_and_refresh(city_lookup, interval):
+    """Build the tree from the latest observations, then refresh the tree every `interval`
+    seconds. Runs on a background thread so that no request waits for the (every region)
+    build.
+    """
+    global _tree, _builder
+
+    try:
+        tree = RollupTree(city_lookup)
+        table = get_observation_table()
+        if table is not None:
+            tree.refresh(table)
+    except Exception as error:  # pylint: disable=broad-except
+        # the next request starts the build again
+        logger.error("Failed to build the rollups: %s", error)
+        with _tree_lock:
+            _builder = None
+        return
+    logger.info("Built rollups for %d stations", len(tree.stations))
+    _tree = tree
+
+    while True:
+        sleep(interval)
+        table = get_observation_table()
+        if table is not None and table.created != tree.created:
+            changed = tree.refresh(table)
+            logger.info("Refreshed rollups, %d stations changed", changed)
+
+
+def get_rollup_tree(city_lookup, interval=None):
+    """Get the rollup tree. The first call starts a background thread that builds the tree
+    from the latest observations and then keeps the tree up to date.
+
+    :param city_lookup: dictionary of state -> city -> {"buoys": [station IDs]}
+    :param interval: number of seconds between refreshes (default LATEST_OBS_MAX_AGE)
+    :return: RollupTree, None while the tree is being built
+    """
+    global _builder
+
+    with _tree_lock:
+        if _builder is None:
+            _builder = Thread(
+                target=_build_and_refresh,
+                args=(city_lookup, interval or LatestObservationsMaxAge),
+                daemon=True
+            )
+            _builder.start()
+
+    return _tree
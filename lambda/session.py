@@ -0,0 +1,137 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from os import environ
+from time import time
+from buoy_lookup import TotalBuoyVariables
+
+
+# Number of seconds, measured from the time the observations were retrieved, that the
+# observations retrieved during a session are reused to answer follow-up questions about the
+# same station
+SessionObservationsMaxAge = float(environ.get("SESSION_OBS_MAX_AGE", 600.0))
+
+# Number of stations whose observations are kept in the session attributes
+SessionObservationsStations = int(environ.get("SESSION_OBS_STATIONS", 3))
+
+# Position of each variable in the mask of an entry
+_VariableBits = {key: 1 << i for i, key in enumerate(TotalBuoyVariables)}
+
+
+class SessionObservations:
+    """Observations retrieved for stations during a session. The observations are kept in
+    the session attributes, so a follow-up question about the same station (ex. `what about
+    the wind speed`) is answered without retrieving the station again. Each station is
+    stored as a list: the time the observation was retrieved, the time of the observation
+    (None when unknown), the mask of the variables that were requested and the values of
+    the requested variables (in the order of TotalBuoyVariables, None when the variable was
+    not reported).
+    """
+
+    Key = "observations"
+
+    def __init__(self, attributes, max_age=None, max_stations=None):
+        """
+        :param attributes: session attributes (dictionary), updated in place
+        :param max_age: number of seconds an entry is valid (default SESSION_OBS_MAX_AGE)
+        :param max_stations: number of stations that are kept (default SESSION_OBS_STATIONS)
+        """
+        self.attributes = attributes
+        self.max_age = SessionObservationsMaxAge if max_age is None else max_age
+        self.max_stations = SessionObservationsStations if max_stations is None else max_stations
+
+    @property
+    def entries(self):
+        """Dictionary of station -> [retrieved, observed, mask, values...], oldest station first"""
+        return self.attributes.setdefault(self.Key, {})
+
+    @property
+    def latest(self):
+        """Station of the most recent observation, None when there are no observations"""
+        return next(reversed(list(self.entries)), None)
+
+    def _fresh(self, station):
+        entry = self.entries.get(str(station).upper())
+        if entry is None or time() - entry[0] > self.max_age:
+            return None
+        return entry
+
+    @staticmethod
+    def _unpack(entry):
+        """Dictionary of variable -> value (None when not reported) of an entry"""
+        values = iter(entry[3:])
+        return {key: next(values) for key, bit in _VariableBits.items() if entry[2] & bit}
+
+    def get(self, station, variable_dict):
+        """Get the observation of a station.
+
+        :param station: ID of the buoy (station)
+        :param variable_dict: dictionary where the keys control what variables are returned
+        :return: dictionary of the reported values or None when the station was not
+        retrieved during the session, the observation is too old or was not retrieved with
+        all the requested variables
+        """
+        entry = self._fresh(station)
+        if entry is None or any(not entry[2] & _VariableBits.get(key, 0) for key in variable_dict):
+            return None
+        values = self._unpack(entry)
+        return {key: values[key] for key in variable_dict if values[key] is not None}
+
+    def observed_time(self, station):
+        """Get the time of the observation of a station (freshness of the data).
+
+        :param station: ID of the buoy (station)
+        :return: epoch time (UTC) of the observation, None when the station was not
+        retrieved during the session, the observation is too old or the time is unknown
+        """
+        entry = self._fresh(station)
+        return None if entry is None else entry[1]
+
+    def put(self, station, variable_dict, data, observed=None):
+        """Save the observation retrieved for a station, the variables are added to a recent
+        observation of the same station.
+
+        :param station: ID of the buoy (station)
+        :param variable_dict: dictionary of the variables that were requested
+        :param data: dictionary of the data that was retrieved
+        :param observed: epoch time (UTC) of the observation, None when unknown
+        """
+        station = str(station).upper()
+        observed = None if observed is None else int(observed)
+        entry = self._fresh(station)
+        values = self._unpack(entry) if entry is not None else {}
+        values.update({key: data.get(key) for key in variable_dict if key in _VariableBits})
+
+        mask = 0
+        for key in values:
+            mask |= _VariableBits[key]
+
+        entries = self.entries
+        entries.pop(station, None)
+        if entry is not None:
+            # the observation of the merged variables is as old as its oldest part
+            observed = min((x for x in (entry[1], observed) if x is not None), default=None)
+        entries[station] = [
+            entry[0] if entry is not None else int(time()), observed, mask
+        ] + [values[key] for key in _VariableBits if key in values]
+        while len(entries) > self.max_stations:
+            entries.pop(next(iter(entries)))
@@ -0,0 +1,136 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from collections import defaultdict
+from heapq import nsmallest
+from json import loads
+from math import asin, ceil, cos, floor, radians, sin, sqrt
+
+
+# Mean radius of the earth, the same values that nautical (haversine) uses so the
+# distances match the distances used by the scraper.
+EarthRadius = {
+    "miles": 6371.0088 * 0.621371192,
+    "kilometers": 6371.0088,
+    "nautical_miles": 6371.0088 * 0.539956803,
+}
+
+
+def haversine(lat1, lon1, lat2, lon2, units="miles"):
+    """Great circle distance between two points.
+
+    :param lat1: latitude of the first point (degrees)
+    :param lon1: longitude of the first point (degrees)
+    :param lat2: latitude of the second point (degrees)
+    :param lon2: longitude of the second point (degrees)
+    :param units: miles, kilometers or nautical_miles
+    :return: distance in the units
+    """
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    d = sin((lat2 - lat1) * 0.5) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) * 0.5) ** 2
+    return 2 * EarthRadius[units] * asin(sqrt(d))
+
+
+class BuoyIndex:
+    """Grid based spatial index of the buoy locations. The buoys are placed in cells of
+    `cell` degrees, a radius query only measures the distance to the buoys in the cells
+    that overlap the radius.
+    """
+
+    def __init__(self, locations, cell=1.0):
+        """
+        :param locations: dictionary of station -> (latitude, longitude)
+        :param cell: size of the grid cells in degrees
+        """
+        self.cell = cell
+        self.columns = max(1, ceil(360.0 / cell))
+        self.locations = {station: (float(lat), float(lon)) for station, (lat, lon) in locations.items()}
+        self._grid = defaultdict(list)
+        for station, (lat, lon) in self.locations.items():
+            self._grid[self._cell(lat, lon)].append((station, lat, lon))
+
+    @classmethod
+    def from_file(cls, filename, cell=1.0):
+        """Create the index from a json file of station -> [latitude, longitude]"""
+        with open(filename, "r") as jsonfile:
+            return cls(loads(jsonfile.read()), cell)
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __contains__(self, station):
+        return str(station).upper() in self.locations
+
+    def _cell(self, lat, lon):
+        return floor(lat / self.cell), floor((lon + 180.0) / self.cell) % self.columns
+
+    def _candidates(self, lat, lon, radius, units):
+        """Buoys in the cells that overlap the radius around the point"""
+        # one degree of latitude is ~69 miles (~111 km)
+        span = radius / (EarthRadius[units] * radians(1.0))
+        widest = min(abs(lat) + span, 90.0)
+        lon_span = span / cos(radians(widest)) if widest < 90.0 else 360.0
+
+        first_row, last_row = floor((lat - span) / self.cell), floor((lat + span) / self.cell)
+        if lon_span * 2 >= 360.0:
+            columns = range(self.columns)
+        else:
+            first_column = floor((lon - lon_span + 180.0) / self.cell)
+            last_column = floor((lon + lon_span + 180.0) / self.cell)
+            columns = sorted({x % self.columns for x in range(first_column, last_column + 1)})
+
+        for row in range(first_row, last_row + 1):
+            for column in columns:
+                yield from self._grid.get((row, column), [])
+
+    def within(self, lat, lon, radius, units="miles"):
+        """Find the buoys within a radius of a point.
+
+        :param lat: latitude (degrees)
+        :param lon: longitude (degrees)
+        :param radius: max distance between the point and the buoy
+        :param units: miles, kilometers or nautical_miles
+        :return: list of (station, distance) tuples, nearest first
+        """
+        found = []
+        for station, buoy_lat, buoy_lon in self._candidates(lat, lon, radius, units):
+            distance = haversine(lat, lon, buoy_lat, buoy_lon, units)
+            if distance <= radius:
+                found.append((station, distance))
+        return sorted(found, key=lambda x: x[1])
+
+    def nearest(self, lat, lon, k=3, radius=None, units="miles"):
+        """Find the nearest buoys to a point.
+
+        :param lat: latitude (degrees)
+        :param lon: longitude (degrees)
+        :param k: number of buoys
+        :param radius: max distance between the point and the buoy, None for any distance
+        :param units: miles, kilometers or nautical_miles
+        :return: list of (station, distance) tuples, nearest first
+        """
+        if radius is not None:
+            return self.within(lat, lon, radius, units)[:k]
+        return nsmallest(
+            k, ((station, haversine(lat, lon, x, y, units)) for station, (x, y) in self.locations.items()),
+            key=lambda x: x[1]
+        )
@@ -0,0 +1,76 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging
+from os import environ
+from threading import Thread
+from time import perf_counter
+
+
+logger = logging.getLogger(__name__)
+
+# Controls when the indexes, lookups, http opener and caches are built:
+# - eager: during the lambda init phase (module import)
+# - lazy: by the first request that uses them
+# - background: on a thread started during the init phase
+InitStrategies = ("eager", "lazy", "background")
+InitStrategy = environ.get("INIT_STRATEGY", "lazy").lower()
+
+
+def run_init_steps(steps):
+    """Run each of the init steps and log the duration of each.
+
+    :param steps: list of (name, function) tuples
+    :return: dictionary of the step name to the duration in seconds
+    """
+    durations = {}
+    for name, step in steps:
+        start = perf_counter()
+        try:
+            step()
+        except Exception as error:  # pylint: disable=broad-except
+            # a failed step is retried by the first request that needs it
+            logger.error("Init step %s failed: %s", name, error)
+        durations[name] = perf_counter() - start
+        logger.info("Init step %s took %.3f seconds", name, durations[name])
+    return durations
+
+
+def initialize(steps, strategy=None):
+    """Run the init steps according to the init strategy.
+
+    :param steps: list of (name, function) tuples
+    :param strategy: one of InitStrategies (default INIT_STRATEGY)
+    :return: the background thread when the strategy is background, otherwise None
+    """
+    strategy = strategy or InitStrategy
+    if strategy not in InitStrategies:
+        logger.warning("Unknown init strategy %s, using lazy", strategy)
+        strategy = "lazy"
+
+    if strategy == "eager":
+        run_init_steps(steps)
+    elif strategy == "background":
+        thread = Thread(target=run_init_steps, args=(steps,), daemon=True)
+        thread.start()
+        return thread
+    return None
@@ -0,0 +1,156 @@
+"""alexa-buoys License
+
+Copyright (c) 2023 Brent Barbachem
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import logging
+import sys
+from array import array
+from bisect import bisect_left
+from os import environ, getcwd
+from os.path import exists, join, realpath, dirname
+from struct import Struct
+from threading import Lock
+
+
+logger = logging.getLogger(__name__)
+
+__location__ = realpath(join(getcwd(), dirname(__file__)))
+
+# Table of the ZIP code (ZCTA) centroids created by the scraper (`scraper.py -f zips`)
+ZipTableFile = environ.get("ZIP_TABLE_FILE", join(__location__, "location_data", "zip_centroids.bin"))
+
+# The table is a header followed by three little endian arrays of `count` items: the ZIP
+# codes (uint32, sorted), the latitudes and the longitudes (int32, degrees * ZipScale).
+ZipTableHeader = Struct("<4sHHI")
+ZipTableMagic = b"ZCTA"
+ZipTableVersion = 1
+ZipScale = 100000
+
+
+def normalize_zip_code(value):
+    """Convert a spoken ZIP code to the number of the ZIP code. Leading zeros are often
+    dropped by the number slot (ex. 02134 is 2134).
+
+    :param value: slot value (ex. `23451` or `2134`)
+    :return: ZIP code as an integer, None when the value is not a ZIP code
+    """
+    digits = "".join(x for x in str(value or "") if x.isdigit())
+    if not digits or len(digits) > 5:
+        return None
+    return int(digits)
+
+
+def write_zip_table(centroids, filename):
+    """Write the ZIP code centroids in the binary format of the table.
+
+    :param centroids: dictionary of ZIP code (int or str) -> (latitude, longitude)
+    :param filename: path of the table
+    """
+    codes = array("I")
+    lats = array("i")
+    lons = array("i")
+    for code, (lat, lon) in sorted((int(k), v) for k, v in centroids.items()):
+        codes.append(code)
+        lats.append(round(float(lat) * ZipScale))
+        lons.append(round(float(lon) * ZipScale))
+
+    if sys.byteorder == "big":
+        for values in (codes, lats, lons):
+            values.byteswap()
+
+    with open(filename, "wb") as table:
+        table.write(ZipTableHeader.pack(ZipTableMagic, ZipTableVersion, 0, len(codes)))
+        for values in (codes, lats, lons):
+            table.write(values.tobytes())
+
+
+class ZipCodeTable:
+    """ZIP code centroids, the table is read the first time a ZIP code is requested. The
+    lookup is a binary search of the sorted ZIP codes.
+    """
+
+    def __init__(self, filename=None):
+        """
+        :param filename: path of the table (default ZIP_TABLE_FILE)
+        """
+        self.filename = filename or ZipTableFile
+        self._codes = None
+        self._lats = None
+        self._lons = None
+        self._loaded = False
+        self._lock = Lock()
+
+    def _load(self):
+        """Read the table, the table is empty when the file does not exist or is invalid"""
+        codes, lats, lons = array("I"), array("i"), array("i")
+        if not exists(self.filename):
+            logger.warning("ZIP code table %s does not exist", self.filename)
+        else:
+            with open(self.filename, "rb") as table:
+                content = table.read()
+            magic, version, _, count = ZipTableHeader.unpack_from(content)
+            size = ZipTableHeader.size + count * (codes.itemsize + lats.itemsize + lons.itemsize)
+            if magic != ZipTableMagic or version != ZipTableVersion or len(content) != size:
+                logger.error("Invalid ZIP code table %s", self.filename)
+            else:
+                offset = ZipTableHeader.size
+                for values in (codes, lats, lons):
+                    values.frombytes(content[offset:offset + count * values.itemsize])
+                    offset += count * values.itemsize
+                    if sys.byteorder == "big":
+                        values.byteswap()
+                logger.info("Loaded %d ZIP codes", count)
+        self._codes, self._lats, self._lons = codes, lats, lons
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    @property
+    def available(self):
+        """True when the table contains ZIP codes"""
+        self._ensure_loaded()
+        return len(self._codes) > 0
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._codes)
+
+    def lookup(self, zip_code):
+        """Find the centroid of a ZIP code.
+
+        :param zip_code: ZIP code (int or the spoken value)
+        :return: (latitude, longitude), None when the ZIP code is not in the table
+        """
+        code = zip_code if isinstance(zip_code, int) else normalize_zip_code(zip_code)
+        if code is None:
+            return None
+
+        self._ensure_loaded()
+        index = bisect_left(self._codes, code)
+        if index == len(self._codes) or self._codes[index] != code:
+            return None
+        return self._lats[index] / ZipScale, self._lons[index] / ZipScale
+
+
+Zip_Codes = ZipCodeTable()